@@ -0,0 +1,39 @@
+"""add track variants
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Transcoded renditions of each track, one row per codec and bitrate
+    op.create_table(
+        'track_variants',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('track_id', sa.String(36), sa.ForeignKey('tracks.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('codec', sa.String(20), nullable=False),
+        sa.Column('bitrate', sa.Integer, nullable=False),
+        sa.Column('audio_url', sa.String(255), nullable=False),
+        sa.Column('file_size', sa.Integer, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.UniqueConstraint('track_id', 'codec', 'bitrate', name='uq_track_variants_track_codec_bitrate'),
+    )
+    op.create_index('ix_track_variants_id', 'track_variants', ['id'])
+    op.create_index('ix_track_variants_track_id', 'track_variants', ['track_id'])
+
+
+def downgrade():
+    op.drop_index('ix_track_variants_track_id', table_name='track_variants')
+    op.drop_index('ix_track_variants_id', table_name='track_variants')
+    op.drop_table('track_variants')
@@ -0,0 +1,30 @@
+"""add seed version
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Version of the default data seeded at startup, so restarts can skip seeding
+    op.create_table(
+        'seed_version',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('version', sa.Integer, nullable=False),
+        sa.Column('seeded_at', sa.DateTime, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('seed_version')
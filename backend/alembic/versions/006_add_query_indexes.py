@@ -0,0 +1,40 @@
+"""add indexes for the list and history queries
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns), matching the Index declarations on the models
+INDEXES = {
+    'ix_messages_chat_id_created_at': ('messages', ['chat_id', 'created_at', 'id']),
+    'ix_chats_user_id_updated_at': ('chats', ['user_id', 'updated_at']),
+    'ix_characters_user_id_created_at': ('characters', ['user_id', 'created_at']),
+    'ix_recently_played_user_id_played_at': ('recently_played', ['user_id', 'played_at']),
+    'ix_playlists_user_id': ('playlists', ['user_id']),
+    'ix_user_favorites_user_id': ('user_favorites', ['user_id']),
+    'ix_playlist_tracks_playlist_id': ('playlist_tracks', ['playlist_id']),
+}
+
+
+def upgrade():
+    # Built CONCURRENTLY on Postgres so the tables stay writable, which
+    # cannot happen inside a transaction
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, (table, _) in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
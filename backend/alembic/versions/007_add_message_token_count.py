@@ -0,0 +1,26 @@
+"""add token count to messages
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Prompt tokens of each message, counted once at insert time. Existing
+    # rows stay NULL and are counted when they are loaded as context.
+    op.add_column('messages', sa.Column('token_count', sa.Integer, nullable=True))
+
+
+def downgrade():
+    op.drop_column('messages', 'token_count')
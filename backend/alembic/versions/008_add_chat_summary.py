@@ -0,0 +1,27 @@
+"""add rolling summary to chats
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Summary of the conversation so far and the newest message it covers
+    op.add_column('chats', sa.Column('summary', sa.Text, nullable=True))
+    op.add_column('chats', sa.Column('summary_until', sa.DateTime, nullable=True))
+
+
+def downgrade():
+    op.drop_column('chats', 'summary_until')
+    op.drop_column('chats', 'summary')
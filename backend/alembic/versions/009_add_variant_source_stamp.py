@@ -0,0 +1,27 @@
+"""record the source file each track variant was made from
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-16 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Modification time and size of the source file when the variant was transcoded
+    op.add_column('track_variants', sa.Column('source_mtime', sa.Float, nullable=True))
+    op.add_column('track_variants', sa.Column('source_size', sa.BigInteger, nullable=True))
+
+
+def downgrade():
+    op.drop_column('track_variants', 'source_size')
+    op.drop_column('track_variants', 'source_mtime')
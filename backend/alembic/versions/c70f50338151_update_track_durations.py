@@ -1,7 +1,7 @@
 """update track durations
 
 Revision ID: c70f50338151
-Revises: 002_make_chat_title_nullable
+Revises: 002
 Create Date: 2024-01-10 12:00:00.000000
 
 """
@@ -9,11 +9,11 @@ from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.orm import Session
 import os
-from app.utils.media_converter import get_audio_duration
+from app.utils.media_converter import get_audio_duration, duration_cache
 
 # revision identifiers, used by Alembic.
 revision = 'c70f50338151'
-down_revision = '002_make_chat_title_nullable'
+down_revision = '002'
 branch_labels = None
 depends_on = None
 
@@ -28,7 +28,7 @@ def upgrade() -> None:
 
     try:
         # Get all tracks
-        tracks = connection.execute(sa.text('SELECT id, audio_url, duration FROM track'))
+        tracks = connection.execute(sa.text('SELECT id, audio_url, duration FROM tracks'))
         
         # Update duration for each track
         for track in tracks:
@@ -37,11 +37,12 @@ def upgrade() -> None:
                 actual_duration = get_audio_duration(audio_path)
                 if actual_duration != track.duration:
                     connection.execute(
-                        sa.text('UPDATE track SET duration = :duration WHERE id = :id'),
+                        sa.text('UPDATE tracks SET duration = :duration WHERE id = :id'),
                         {'duration': actual_duration, 'id': track.id}
                     )
         
         session.commit()
+        duration_cache.save()
     except Exception as e:
         session.rollback()
         raise e
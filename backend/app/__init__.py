@@ -2,7 +2,6 @@ __version__ = "1.0.0"
 
 # Import these after version to avoid circular imports
 from .config import settings
-from .database import engine, Base, get_db, cleanup_db
+from .database import get_db, cleanup_db
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Tables are created and migrated at startup, see app/migrations.py
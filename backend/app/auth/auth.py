@@ -2,11 +2,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime, timedelta
-from ..database import get_db
+from ..database import get_async_db
 from ..models.database import User
+from .user_cache import CachedUser, user_cache
 
 from ..config import settings
 
@@ -24,6 +27,10 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
 def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
     if not user:
@@ -39,10 +46,52 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_media_token(user_id: str, track_id: str) -> str:
+    """Short-lived token that authorizes fetching one track's HLS files from a URL"""
+    expire = datetime.utcnow() + timedelta(minutes=settings.HLS_TOKEN_EXPIRE_MINUTES)
+    to_encode = {"scope": "hls", "uid": user_id, "track": track_id, "exp": expire}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_media_token(token: str, track_id: str) -> Optional[str]:
+    """Return the user id a media token was issued to, or None if it is not valid for the track"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("scope") != "hls" or payload.get("track") != track_id:
+        return None
+    return payload.get("uid")
+
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[CachedUser]:
+    """
+    Resolve a bearer token to its user, or None if it is invalid.
+
+    Users are served from ``user_cache`` while the entry is fresh, so most
+    authenticated requests never touch the database.
+    """
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        if username is None:
+            return None
+    except JWTError:
+        return None
+
+    user = await get_user_by_username(db, username)
+    if user is None:
+        return None
+    snapshot = CachedUser.from_user(user)
+    user_cache.put(token, snapshot, token_exp=payload.get("exp"))
+    return snapshot
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> CachedUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,15 +101,7 @@ async def get_current_user(
     if not token:
         raise credentials_exception
         
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_from_token(db, token)
     if user is None:
         raise credentials_exception
         
@@ -68,18 +109,9 @@ async def get_current_user(
 
 async def get_current_user_optional(
     token: Optional[str] = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[CachedUser]:
     if not token:
         return None
         
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-    except JWTError:
-        return None
-        
-    user = db.query(User).filter(User.username == username).first()
-    return user
+    return await get_user_from_token(db, token)
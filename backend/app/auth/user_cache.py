@@ -0,0 +1,165 @@
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.database import User
+
+# Session.info key collecting the ids of users changed in the current transaction
+CHANGED_USERS_KEY = "auth_cache_changed_users"
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Read-only copy of the user columns that request handlers rely on"""
+    id: str
+    username: str
+    avatar_url: Optional[str]
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            avatar_url=user.avatar_url,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "avatar_url": self.avatar_url,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "is_active": self.is_active
+        }
+
+class UserCache:
+    """
+    Bounded TTL cache of access token -> authenticated user.
+
+    An entry lives for ``ttl`` seconds or until its token expires, whichever
+    is sooner, and the least recently used entries are dropped beyond
+    ``max_size``. Entries of a user are removed when the user is updated or
+    deleted through the ORM in this process; other workers pick the change
+    up once their entry expires.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, CachedUser]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: CachedUser, token_exp: Optional[float] = None):
+        """Cache a user for a token, never past the token's own ``exp`` claim"""
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (time.monotonic() + ttl, user)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+# Shared cache used by the auth dependencies
+user_cache = UserCache(ttl=settings.AUTH_CACHE_TTL, max_size=settings.AUTH_CACHE_SIZE)
+
+def _mark_changed(session: Session, user_id: Optional[str]):
+    # Drop the entries now, and again on commit so a request that read the
+    # old row before the commit cannot keep it cached. None stands for
+    # every user.
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.invalidate_user(user_id)
+    if session is not None:
+        session.info.setdefault(CHANGED_USERS_KEY, set()).add(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    _mark_changed(Session.object_session(target), target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _users_bulk_changed(orm_execute_state):
+    # ORM-enabled UPDATE/DELETE statements do not say which rows they touch
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            _mark_changed(orm_execute_state.session, None)
+
+@event.listens_for(Session, "after_commit")
+def _session_committed(session):
+    for user_id in session.info.pop(CHANGED_USERS_KEY, ()):
+        if user_id is None:
+            user_cache.clear()
+        else:
+            user_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _session_rolled_back(session):
+    session.info.pop(CHANGED_USERS_KEY, None)
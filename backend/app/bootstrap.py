@@ -0,0 +1,59 @@
+"""
+Prepare media and the database ahead of the web server.
+
+Run before uvicorn on every deploy so the web process does not build
+images, GIFs, audio or track renditions itself:
+
+    python -m app.bootstrap [--force] [--workers N] [--skip-track-media]
+
+Placeholder media is built first, then the database is migrated and
+seeded, then HLS renditions, the bitrate ladder and waveform peaks are
+rebuilt for tracks whose source audio is new or has changed.
+"""
+import os
+import sys
+import argparse
+import logging
+
+from .services.asset_bootstrap import bootstrap_assets
+
+logger = logging.getLogger(__name__)
+
+def build_track_media(base_dir: str):
+    """Migrate and seed the database, then derive media for its tracks"""
+    from .database import SessionLocal
+    from .migrations import prepare_database
+    from .services.track_media import build_track_media as build
+
+    prepare_database()
+    db = SessionLocal()
+    try:
+        build(db, base_dir)
+    finally:
+        db.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build placeholder media assets and track renditions")
+    parser.add_argument("--force", action="store_true", help="rebuild every asset, including hand-provided files")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: BOOTSTRAP_WORKERS)")
+    parser.add_argument("--skip-track-media", action="store_true", help="only build placeholder assets")
+    args = parser.parse_args(argv)
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    status = 0
+    try:
+        bootstrap_assets(base_dir, workers=args.workers, force=args.force)
+    except Exception as e:
+        logger.error(f"Asset bootstrap failed: {str(e)}", exc_info=True)
+        status = 1
+
+    if not args.skip_track_media:
+        try:
+            build_track_media(base_dir)
+        except Exception as e:
+            logger.error(f"Track media build failed: {str(e)}", exc_info=True)
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,14 +29,29 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-development")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+    # HLS variant playlists and segments are authorized by a per-track URL token this long
+    HLS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("HLS_TOKEN_EXPIRE_MINUTES", "240"))
     ALGORITHM: str = "HS256"
+    # Authenticated users are cached per token for up to this many seconds (0 disables)
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "60"))
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    # bcrypt runs in its own threads; logins beyond workers + queue size get a 429
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "16"))
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql://aiasmr:aiasmr@db:5432/aiasmr")
-    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
-    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Per-worker pool limits, scaled down when WORKERS pools would exceed the server's limit
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
     DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
     DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Postgres max_connections, and how many of them to leave for migrations and admin sessions
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+    DB_RESERVED_CONNECTIONS: int = int(os.getenv("DB_RESERVED_CONNECTIONS", "5"))
+    # migrate: upgrade to head and seed once; reset: drop and recreate every table (development only)
+    DB_STARTUP_MODE: str = os.getenv("DB_STARTUP_MODE", "migrate").lower()
 
     # CORS Settings
     ALLOWED_ORIGINS: str = os.getenv("ALLOWED_ORIGINS", "*")
@@ -73,22 +88,57 @@ class Settings(BaseSettings):
     # OpenAI Settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    # Alternative endpoint, e.g. a proxy or a local fake server for tests
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "")
     OPENAI_MAX_TOKENS: int = int(os.getenv("OPENAI_MAX_TOKENS", "150"))
     OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     OPENAI_PRESENCE_PENALTY: float = float(os.getenv("OPENAI_PRESENCE_PENALTY", "0.0"))
     OPENAI_FREQUENCY_PENALTY: float = float(os.getenv("OPENAI_FREQUENCY_PENALTY", "0.0"))
+    OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60"))
+    # Chat history sent with each message: at most this many messages and tokens
+    CHAT_CONTEXT_MAX_MESSAGES: int = int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", "5"))
+    CHAT_CONTEXT_MAX_TOKENS: int = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "1500"))
+    # Refresh a chat's rolling summary every this many messages (0 disables)
+    CHAT_SUMMARY_INTERVAL: int = int(os.getenv("CHAT_SUMMARY_INTERVAL", "10"))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
 
     # ElevenLabs Settings
     ELEVENLABS_API_KEY: str = os.getenv("ELEVENLABS_API_KEY", "")
     ELEVENLABS_VOICE_ID: str = os.getenv("ELEVENLABS_VOICE_ID", "")
+    # Alternative endpoint, e.g. a local fake server for tests
+    ELEVENLABS_API_BASE: str = os.getenv("ELEVENLABS_API_BASE", "https://api.elevenlabs.io")
     ELEVENLABS_MODEL_ID: str = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
     ELEVENLABS_OPTIMIZE_STREAMING: bool = os.getenv("ELEVENLABS_OPTIMIZE_STREAMING", "true").lower() == "true"
     ELEVENLABS_STABILITY: float = float(os.getenv("ELEVENLABS_STABILITY", "0.75"))
     ELEVENLABS_SIMILARITY_BOOST: float = float(os.getenv("ELEVENLABS_SIMILARITY_BOOST", "0.75"))
+    ELEVENLABS_REQUESTS_PER_MINUTE: int = int(os.getenv("ELEVENLABS_REQUESTS_PER_MINUTE", "30"))
+    # Sentences of a reply synthesized at the same time while the completion streams
+    TTS_MAX_PARALLEL: int = int(os.getenv("TTS_MAX_PARALLEL", "3"))
+
+    # Keep-alive connection pool per upstream API (OpenAI, ElevenLabs), per worker
+    AI_HTTP_MAX_CONNECTIONS: int = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20"))
+    AI_HTTP_KEEPALIVE_SECONDS: int = int(os.getenv("AI_HTTP_KEEPALIVE_SECONDS", "60"))
+    AI_HTTP_TIMEOUT: int = int(os.getenv("AI_HTTP_TIMEOUT", "30"))
 
     # Cache Settings
     CACHE_DIR: str = os.getenv("CACHE_DIR", "./cache")
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "604800"))  # 7 days in seconds
+    # Speech cache of the /tts endpoints: hot clips in memory, the rest on disk
+    # under CACHE_DIR/tts, swept in the background every TTS_CACHE_SWEEP_INTERVAL seconds
+    TTS_CACHE_MEMORY_MB: int = int(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+    TTS_CACHE_DISK_MB: int = int(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+    TTS_CACHE_SWEEP_INTERVAL: int = int(os.getenv("TTS_CACHE_SWEEP_INTERVAL", "600"))
+
+    # Media Processing
+    TRANSCODE_WORKERS: int = int(os.getenv("TRANSCODE_WORKERS", "0"))  # 0 = one per CPU core
+    BOOTSTRAP_WORKERS: int = int(os.getenv("BOOTSTRAP_WORKERS", "0"))  # 0 = one per CPU core
+    # Disable when `python -m app.bootstrap` runs before the server starts
+    BOOTSTRAP_ASSETS_ON_STARTUP: bool = os.getenv("BOOTSTRAP_ASSETS_ON_STARTUP", "true").lower() == "true"
+
+    # Play Event Writer
+    PLAY_EVENT_BATCH_SIZE: int = int(os.getenv("PLAY_EVENT_BATCH_SIZE", "500"))
+    PLAY_EVENT_FLUSH_INTERVAL_MS: int = int(os.getenv("PLAY_EVENT_FLUSH_INTERVAL_MS", "1000"))
+    PLAY_EVENT_QUEUE_SIZE: int = int(os.getenv("PLAY_EVENT_QUEUE_SIZE", "10000"))
 
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
@@ -138,7 +188,16 @@ class Settings(BaseSettings):
         
         if is_prod:
             raise ValueError("Only PostgreSQL is supported in production")
-        
+
+        return v
+
+    @validator("DB_STARTUP_MODE")
+    def validate_db_startup_mode(cls, v: str, values: dict) -> str:
+        is_prod = not values.get("DEBUG", False)
+        if v not in ("migrate", "reset"):
+            raise ValueError(f"Invalid DB startup mode: {v} (expected 'migrate' or 'reset')")
+        if is_prod and v == "reset":
+            raise ValueError("DB startup mode 'reset' would wipe the database and is not allowed in production")
         return v
 
     @validator("OPENAI_API_KEY")
@@ -285,10 +344,17 @@ logger.info("\n=== Database Configuration ===")
 logger.info(f"Database Type: {'SQLite' if settings.DATABASE_URL.startswith('sqlite') else 'PostgreSQL'}")
 logger.info(f"Pool Size: {settings.DB_POOL_SIZE}")
 logger.info(f"Max Overflow: {settings.DB_MAX_OVERFLOW}")
+logger.info(f"Max Connections: {settings.DB_MAX_CONNECTIONS} ({settings.DB_RESERVED_CONNECTIONS} reserved)")
+logger.info(f"Startup Mode: {settings.DB_STARTUP_MODE}")
 
 logger.info("\n=== Performance Configuration ===")
 logger.info(f"Rate Limit: {settings.RATE_LIMIT_REQUESTS} requests per {settings.RATE_LIMIT_WINDOW} seconds")
 logger.info(f"Cache TTL: {settings.CACHE_TTL} seconds")
+logger.info(f"Auth Cache: {settings.AUTH_CACHE_SIZE} tokens for {settings.AUTH_CACHE_TTL} seconds")
+logger.info(f"Password Hashing: {settings.PASSWORD_HASH_WORKERS} workers, {settings.PASSWORD_HASH_QUEUE_SIZE} queued")
+logger.info(f"Play Event Batch: {settings.PLAY_EVENT_BATCH_SIZE} rows / {settings.PLAY_EVENT_FLUSH_INTERVAL_MS}ms")
+logger.info(f"TTS Parallelism: {settings.TTS_MAX_PARALLEL} sentences per reply")
+logger.info(f"TTS Cache: {settings.TTS_CACHE_MEMORY_MB}MB memory / {settings.TTS_CACHE_DISK_MB}MB disk, swept every {settings.TTS_CACHE_SWEEP_INTERVAL}s")
 logger.info(f"Keep Alive: {settings.KEEP_ALIVE} seconds")
 logger.info(f"Graceful Timeout: {settings.GRACEFUL_TIMEOUT} seconds")
 
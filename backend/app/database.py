@@ -1,16 +1,149 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .models.database import Base, User, Track, Playlist
 from .config import settings
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL)
+# Connections kept by the synchronous engine, which after the move to the
+# async engine only serves startup, migrations and background writers
+SYNC_POOL_SIZE = 2
+SYNC_MAX_OVERFLOW = 3
+
+class PoolWaitStatsMixin:
+    """Records how long pool checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+class InstrumentedQueuePool(PoolWaitStatsMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(PoolWaitStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+def get_pool_limits():
+    """
+    Per-worker pool size and overflow for request handling.
+
+    The configured values are scaled down so that the pools of all
+    ``WORKERS`` processes, including their small synchronous pools, together
+    stay within the server's connection limit.
+    """
+    workers = max(settings.WORKERS, 1)
+    budget = (settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS) // workers
+    budget = max(budget - SYNC_POOL_SIZE - SYNC_MAX_OVERFLOW, 1)
+    pool_size = max(min(settings.DB_POOL_SIZE, budget), 1)
+    max_overflow = max(min(settings.DB_MAX_OVERFLOW, budget - pool_size), 0)
+    return pool_size, max_overflow
+
+def get_async_database_url(url: str) -> str:
+    """Switch a database URL to its asyncio driver (asyncpg, aiosqlite)"""
+    for prefix, async_prefix in (("postgresql://", "postgresql+asyncpg://"), ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+def create_db_engine():
+    """Create the synchronous engine used outside request handling"""
+    if settings.DATABASE_URL.startswith("sqlite"):
+        # SQLite uses its own pool classes; the sizing settings do not apply
+        return create_engine(settings.DATABASE_URL)
+
+    return create_engine(
+        settings.DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=SYNC_POOL_SIZE,
+        max_overflow=SYNC_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+def create_async_db_engine():
+    """Create the async engine used by the routers, with a sized and instrumented pool for Postgres"""
+    url = get_async_database_url(settings.DATABASE_URL)
+    if settings.DATABASE_URL.startswith("sqlite"):
+        return create_async_engine(url)
+
+    pool_size, max_overflow = get_pool_limits()
+    if (pool_size, max_overflow) != (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW):
+        logger.warning(
+            f"Connection pool reduced to size {pool_size} overflow {max_overflow} so that "
+            f"{settings.WORKERS} workers fit in {settings.DB_MAX_CONNECTIONS} connections"
+        )
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+# Create database engines
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay usable after commit, since lazy loading is not available in async code
+async_engine = create_async_db_engine()
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def _get_engine_pool_stats(pool):
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, PoolWaitStatsMixin):
+        with pool._stats_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "avg_wait_ms": round(pool.total_wait / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                "max_wait_ms": round(pool.max_wait * 1000, 3),
+            })
+    return stats
+
+def get_pool_stats():
+    """Snapshot of the connection pools' usage and checkout wait times"""
+    return {
+        "requests": _get_engine_pool_stats(async_engine.pool),
+        "background": _get_engine_pool_stats(engine.pool),
+    }
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
@@ -19,10 +152,19 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def cleanup_db():
     """Cleanup database connections"""
     engine.dispose()
 
+async def cleanup_async_db():
+    """Cleanup async database connections"""
+    await async_engine.dispose()
+
 def check_db_connection():
     """Check database connection"""
     try:
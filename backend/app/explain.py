@@ -0,0 +1,153 @@
+"""
+Report which of the routers' hot queries cannot use an index.
+
+Runs EXPLAIN on the query shapes the chat, character and audio routers
+issue and flags every sequential scan:
+
+    python -m app.explain [--verbose]
+
+On Postgres sequential scans are disabled for the session first, so a
+plan that still scans a table has no usable index no matter how small the
+table is. Exits with status 1 when any query is flagged.
+"""
+import sys
+import argparse
+import logging
+from typing import Callable, List, Tuple
+
+from datetime import datetime
+
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.engine import Connection
+
+from .config import settings
+from .database import engine
+from .models.database import (
+    Character, Chat, Message, Playlist, RecentlyPlayed, Track, TrackVariant, User,
+    generate_uuid, playlist_tracks, user_favorites
+)
+from .routers.chat import last_messages_query
+
+logger = logging.getLogger(__name__)
+
+# Placeholder ids; the plan does not depend on the values
+SAMPLE_USER_ID = generate_uuid()
+SAMPLE_CHAT_ID = generate_uuid()
+SAMPLE_TRACK_ID = generate_uuid()
+SAMPLE_PLAYLIST_ID = generate_uuid()
+SAMPLE_MESSAGE_ID = generate_uuid()
+SAMPLE_CREATED_AT = datetime(2024, 1, 1)
+
+def get_queries() -> List[Tuple[str, Callable]]:
+    """Query shapes issued by the routers, as (name, statement factory)"""
+    return [
+        ("user by username", lambda: select(User).where(User.username == "fffft")),
+        ("chat messages", lambda: (
+            select(Message).where(Message.chat_id == SAMPLE_CHAT_ID)
+            .order_by(Message.created_at.asc(), Message.id.asc()).limit(51)
+        )),
+        ("chat messages after cursor", lambda: (
+            select(Message).where(
+                Message.chat_id == SAMPLE_CHAT_ID,
+                tuple_(Message.created_at, Message.id) > tuple_(SAMPLE_CREATED_AT, SAMPLE_MESSAGE_ID)
+            )
+            .order_by(Message.created_at.asc(), Message.id.asc()).limit(51)
+        )),
+        ("chat messages before cursor", lambda: (
+            select(Message).where(
+                Message.chat_id == SAMPLE_CHAT_ID,
+                tuple_(Message.created_at, Message.id) < tuple_(SAMPLE_CREATED_AT, SAMPLE_MESSAGE_ID)
+            )
+            .order_by(Message.created_at.desc(), Message.id.desc()).limit(51)
+        )),
+        ("chat context window", lambda: (
+            select(Message.content, Message.is_from_user, Message.token_count)
+            .where(Message.chat_id == SAMPLE_CHAT_ID, Message.content != "")
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(settings.CHAT_CONTEXT_MAX_MESSAGES)
+        )),
+        ("user chats", lambda: (
+            select(Chat).where(Chat.user_id == SAMPLE_USER_ID)
+            .order_by(Chat.updated_at.desc()).limit(20)
+        )),
+        ("chat list last messages", lambda: last_messages_query([SAMPLE_CHAT_ID, generate_uuid()])),
+        ("user characters", lambda: (
+            select(Character).where(Character.user_id == SAMPLE_USER_ID)
+            .order_by(Character.created_at.desc()).limit(20)
+        )),
+        ("user character count", lambda: (
+            select(func.count()).select_from(Character).where(Character.user_id == SAMPLE_USER_ID)
+        )),
+        ("recently played", lambda: (
+            select(RecentlyPlayed).where(RecentlyPlayed.user_id == SAMPLE_USER_ID)
+            .order_by(desc(RecentlyPlayed.played_at)).limit(20)
+        )),
+        ("user playlists", lambda: select(Playlist).where(Playlist.user_id == SAMPLE_USER_ID)),
+        ("playlist tracks", lambda: (
+            select(Track).join(playlist_tracks, playlist_tracks.c.track_id == Track.id)
+            .where(playlist_tracks.c.playlist_id == SAMPLE_PLAYLIST_ID)
+        )),
+        ("favorite tracks", lambda: (
+            select(Track).join(user_favorites, user_favorites.c.track_id == Track.id)
+            .where(user_favorites.c.user_id == SAMPLE_USER_ID)
+        )),
+        ("track variants", lambda: select(TrackVariant).where(TrackVariant.track_id == SAMPLE_TRACK_ID)),
+    ]
+
+def explain(connection: Connection, statement) -> List[str]:
+    """EXPLAIN a statement and return the plan, one line per row"""
+    # Expand IN lists into plain parameters so the SQL can be prefixed with EXPLAIN
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params).fetchall()
+    return [row[0] for row in rows]
+
+def find_sequential_scans(plan: List[str]) -> List[str]:
+    """Plan lines that read a whole table instead of going through an index"""
+    flagged = []
+    for line in plan:
+        text = line.strip().lstrip("-> ").strip()
+        # Postgres: "Seq Scan on messages"; SQLite: "SCAN messages" (vs "SEARCH ... USING INDEX")
+        if text.startswith("Seq Scan") or (text.startswith("SCAN ") and "USING" not in text):
+            flagged.append(text)
+    return flagged
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Flag router queries that scan whole tables")
+    parser.add_argument("--verbose", action="store_true", help="print the full plan of every query")
+    args = parser.parse_args(argv)
+
+    flagged_queries = 0
+    with engine.connect() as connection:
+        with connection.begin() as transaction:
+            if connection.dialect.name == "postgresql":
+                connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for name, build in get_queries():
+                try:
+                    plan = explain(connection, build())
+                except Exception as e:
+                    logger.error(f"Could not explain {name}: {str(e)}")
+                    flagged_queries += 1
+                    continue
+                scans = find_sequential_scans(plan)
+                print(f"{'SEQ SCAN' if scans else 'ok':<8}  {name}")
+                for scan in scans:
+                    print(f"          {scan}")
+                if args.verbose:
+                    for line in plan:
+                        print(f"            | {line}")
+                if scans:
+                    flagged_queries += 1
+            transaction.rollback()
+
+    print(f"\n{flagged_queries} of {len(get_queries())} queries flagged")
+    return 1 if flagged_queries else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
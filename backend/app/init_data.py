@@ -1,12 +1,33 @@
 from datetime import datetime
 from sqlalchemy.orm import Session
-from .models.database import Track as TrackModel, Playlist as PlaylistModel, User, Character
-from .utils.media_converter import setup_default_audio, get_audio_duration
+from .models.database import Track as TrackModel, Playlist as PlaylistModel, User, Character, SeedVersion
+from .config import settings
+from .services.asset_bootstrap import bootstrap_assets
+from .utils.media_converter import get_audio_duration, duration_cache
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bump when the default users, characters, tracks or playlists change so
+# existing databases are seeded again on their next start
+SEED_VERSION = 1
+
+def seed_is_current(db: Session) -> bool:
+    """Check whether this database already holds the current default data"""
+    seed = db.query(SeedVersion).first()
+    return seed is not None and seed.version >= SEED_VERSION
+
+def record_seed_version(db: Session):
+    """Mark the current default data as seeded"""
+    seed = db.query(SeedVersion).first()
+    if seed is None:
+        seed = SeedVersion(id=1)
+        db.add(seed)
+    seed.version = SEED_VERSION
+    seed.seeded_at = datetime.utcnow()
+    db.commit()
+
 def update_track_durations(db: Session, base_dir: str):
     """Update durations for all tracks in the database"""
     try:
@@ -20,15 +41,17 @@ def update_track_durations(db: Session, base_dir: str):
                     track.updated_at = datetime.utcnow()
                     logger.info(f"Updated duration for track {track.title} to {actual_duration} seconds")
         db.commit()
+        duration_cache.save()
     except Exception as e:
         logger.error(f"Error updating track durations: {str(e)}")
         db.rollback()
         raise
 
 def init_default_data(db: Session):
-    # Setup default audio files
+    # Setup default media files, unless the bootstrap CLI already ran
     try:
-        setup_default_audio()
+        if settings.BOOTSTRAP_ASSETS_ON_STARTUP:
+            bootstrap_assets(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     except Exception as e:
         print(f"Warning: Failed to setup default audio: {str(e)}")
         # Continue with initialization even if media setup fails
@@ -120,7 +143,7 @@ def init_default_data(db: Session):
     # Initialize database content
     try:
         # Get the base directory for audio files
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         
         # Add tracks if they don't exist
         default_tracks = [
@@ -8,8 +8,14 @@ from .routers.ai import router as ai_router
 from .routers.tts import router as tts_router
 from .routers.audio import router as audio_router
 import logging
-from .database import engine, Base, cleanup_db, check_db_connection
+from .database import cleanup_db, cleanup_async_db, check_db_connection, get_pool_stats
 from .config import settings
+from .services.play_events import play_event_writer
+from .services.password_hasher import password_hasher
+from .services.chat_summarizer import chat_summarizer
+from .services.ai_service import AIService
+from .services.tts_service import tts_cache
+from .auth.user_cache import user_cache
 import uvicorn
 from contextlib import asynccontextmanager
 from datetime import datetime
@@ -24,22 +30,13 @@ logger = logging.getLogger(__name__)
 def startup():
     """Application startup tasks"""
     logger.info("Starting up application...")
-    # Drop all tables and recreate them
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables dropped and recreated successfully")
-    
-    # Create default admin user and initialize tracks
-    from .database import SessionLocal
-    from .routers.auth import create_default_admin
-    from .init_data import init_default_data
-    db = SessionLocal()
-    try:
-        create_default_admin(db)
-        init_default_data(db)
-        logger.info("Default tracks initialized successfully")
-    finally:
-        db.close()
+    from .migrations import prepare_database, reset_database
+    if settings.DB_STARTUP_MODE == "reset":
+        # Development only: wipes every table and seeds from scratch
+        logger.warning("DB_STARTUP_MODE=reset, dropping and recreating all tables")
+        reset_database()
+    else:
+        prepare_database()
 
 def shutdown():
     """Application shutdown tasks"""
@@ -54,7 +51,21 @@ async def lifespan(app: FastAPI):
     Handles startup and shutdown events.
     """
     startup()
+    play_event_writer.start()
+    tts_cache.start()
+    try:
+        app.state.ai_service = AIService()
+    except ValueError as e:
+        logger.warning(f"AI service disabled: {str(e)}")
+        app.state.ai_service = None
     yield
+    await play_event_writer.stop()
+    await chat_summarizer.stop()
+    await tts_cache.stop()
+    if app.state.ai_service is not None:
+        await app.state.ai_service.close()
+    await cleanup_async_db()
+    password_hasher.shutdown()
     shutdown()
 
 # Create FastAPI application
@@ -198,6 +209,36 @@ async def health_check():
             }
         )
 
+@app.get("/health/pool")
+async def pool_health():
+    """Connection pool usage: checked-out and overflow connections and checkout wait times"""
+    return {
+        "status": "healthy",
+        "pool": get_pool_stats(),
+        "timestamp": str(datetime.utcnow())
+    }
+
+@app.get("/health/auth")
+async def auth_health():
+    """Password hashing queue depth and authenticated-user cache hit rate"""
+    return {
+        "status": "healthy",
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "timestamp": str(datetime.utcnow())
+    }
+
+@app.get("/health/tts")
+async def tts_health(request: Request):
+    """Speech cache usage and hit rate per tier, and upstream calls shared while in flight"""
+    ai_service = request.app.state.ai_service
+    return {
+        "status": "healthy",
+        "cache": tts_cache.stats(),
+        "single_flight": ai_service.flight_stats() if ai_service is not None else None,
+        "timestamp": str(datetime.utcnow())
+    }
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled exceptions"""
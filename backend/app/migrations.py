@@ -0,0 +1,133 @@
+import os
+import logging
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from .database import engine, SessionLocal, Base
+from .init_data import init_default_data, seed_is_current, record_seed_version
+
+logger = logging.getLogger(__name__)
+
+# Key of the Postgres advisory lock held while one worker migrates and seeds
+STARTUP_LOCK_ID = 727_361_001
+
+def get_alembic_config(connection: Connection = None) -> Config:
+    """Alembic configuration pointing at backend/alembic, without its logging setup"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config()
+    config.set_main_option("script_location", os.path.join(base_dir, "alembic"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def get_head_revision() -> str:
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+def get_current_revision(connection: Connection):
+    return MigrationContext.configure(connection).get_current_revision()
+
+# Schema that ``create_all`` produced before the app managed migrations itself
+BASELINE_REVISION = "003"
+
+def upgrade_database(connection: Connection):
+    """
+    Bring the schema to the latest migration.
+
+    An empty database gets its tables created from the models and is
+    stamped at head. A database with tables but no migration history was
+    built by ``create_all`` on earlier boots, so it is stamped at
+    ``BASELINE_REVISION`` and upgraded from there; ``create_all`` would not
+    add columns or indexes to the existing tables. Stamped databases are
+    upgraded normally.
+    """
+    config = get_alembic_config(connection)
+    if get_current_revision(connection) is None:
+        if inspect(connection).get_table_names():
+            logger.info(f"Database has no migration history, stamping {BASELINE_REVISION} and upgrading")
+            command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, "head")
+        else:
+            logger.info("Empty database, creating tables and stamping head")
+            Base.metadata.create_all(bind=connection)
+            command.stamp(config, "head")
+    else:
+        command.upgrade(config, "head")
+    logger.info(f"Database schema at revision {get_current_revision(connection)}")
+
+def seed_database(force: bool = False):
+    """Seed the default data unless the current seed version is already recorded"""
+    from .routers.auth import create_default_admin
+
+    db = SessionLocal()
+    try:
+        if not force and seed_is_current(db):
+            logger.info("Default data already seeded")
+            return
+        create_default_admin(db)
+        init_default_data(db)
+        record_seed_version(db)
+        logger.info("Default data seeded successfully")
+    finally:
+        db.close()
+
+def database_is_current(connection: Connection) -> bool:
+    """Fast check that needs no lock: schema at head and seed version recorded"""
+    if get_current_revision(connection) != get_head_revision():
+        return False
+    db = SessionLocal()
+    try:
+        return seed_is_current(db)
+    finally:
+        db.close()
+
+@contextmanager
+def startup_lock(connection: Connection):
+    """
+    Try to take the startup advisory lock, yielding whether it was acquired.
+
+    Only Postgres has advisory locks; other databases are assumed to be used
+    by a single development process.
+    """
+    if connection.dialect.name != "postgresql":
+        yield True
+        return
+    acquired = connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": STARTUP_LOCK_ID}).scalar()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": STARTUP_LOCK_ID})
+
+def prepare_database():
+    """
+    Migrate and seed the database once across all workers.
+
+    Workers that find the schema at head and the seed recorded start right
+    away. Otherwise one worker takes a Postgres advisory lock, runs the
+    migrations and seeds; the others skip both and start serving.
+    """
+    with engine.connect() as connection:
+        if database_is_current(connection):
+            logger.info("Database is up to date, skipping migrations and seeding")
+            return
+        with startup_lock(connection) as acquired:
+            if not acquired:
+                logger.info("Another worker is migrating the database, starting without waiting")
+                return
+            upgrade_database(connection)
+            seed_database()
+
+def reset_database():
+    """Drop and recreate every table, then seed from scratch (development only)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    logger.info("Database tables dropped and recreated successfully")
+    with engine.connect() as connection:
+        command.stamp(get_alembic_config(connection), "head")
+    seed_database(force=True)
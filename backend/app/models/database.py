@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Boolean, Float, Table
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Boolean, Float, BigInteger, Table, UniqueConstraint, Index, inspect
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+from typing import Optional
 from ..schemas.audio import Track as TrackSchema
 import uuid
 
@@ -16,6 +17,7 @@ playlist_tracks = Table(
     Base.metadata,
     Column('playlist_id', String(36), ForeignKey('playlists.id', ondelete="CASCADE")),
     Column('track_id', String(36), ForeignKey('tracks.id', ondelete="CASCADE")),
+    Index('ix_playlist_tracks_playlist_id', 'playlist_id'),
 )
 
 user_favorites = Table(
@@ -23,6 +25,7 @@ user_favorites = Table(
     Base.metadata,
     Column('user_id', String(36), ForeignKey('users.id', ondelete="CASCADE")),
     Column('track_id', String(36), ForeignKey('tracks.id', ondelete="CASCADE")),
+    Index('ix_user_favorites_user_id', 'user_id'),
 )
 
 class User(Base):
@@ -74,6 +77,7 @@ class Track(Base):
     playlists = relationship("Playlist", secondary=playlist_tracks, back_populates="tracks")
     recently_played = relationship("RecentlyPlayed", back_populates="track")
     favorited_by = relationship("User", secondary=user_favorites, back_populates="favorite_tracks")
+    variants = relationship("TrackVariant", back_populates="track", cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -92,8 +96,42 @@ class Track(Base):
             "updated_at": self.updated_at.isoformat()
         }
 
+class TrackVariant(Base):
+    __tablename__ = "track_variants"
+    __table_args__ = (
+        UniqueConstraint("track_id", "codec", "bitrate", name="uq_track_variants_track_codec_bitrate"),
+    )
+
+    id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
+    track_id = Column(String(36), ForeignKey("tracks.id", ondelete="CASCADE"), nullable=False, index=True)
+    codec = Column(String(20), nullable=False)  # aac, opus
+    bitrate = Column(Integer, nullable=False)  # kbps
+    audio_url = Column(String(255), nullable=False)  # Relative to the static directory
+    file_size = Column(Integer, nullable=False)
+    # Source file stamp when transcoded; the variant is redone when it changes
+    source_mtime = Column(Float, nullable=True)
+    source_size = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    track = relationship("Track", back_populates="variants")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "track_id": self.track_id,
+            "codec": self.codec,
+            "bitrate": self.bitrate,
+            "audio_url": self.audio_url,
+            "file_size": self.file_size,
+            "created_at": self.created_at.isoformat()
+        }
+
 class Playlist(Base):
     __tablename__ = "playlists"
+    __table_args__ = (
+        Index("ix_playlists_user_id", "user_id"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -122,6 +160,9 @@ class Playlist(Base):
 
 class RecentlyPlayed(Base):
     __tablename__ = "recently_played"
+    __table_args__ = (
+        Index("ix_recently_played_user_id_played_at", "user_id", "played_at"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -143,6 +184,9 @@ class RecentlyPlayed(Base):
 
 class Character(Base):
     __tablename__ = "characters"
+    __table_args__ = (
+        Index("ix_characters_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -181,12 +225,17 @@ class Character(Base):
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (
+        Index("ix_chats_user_id_updated_at", "user_id", "updated_at"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     character_id = Column(String(36), ForeignKey("characters.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(100))  # Make title nullable
     description = Column(Text)
+    summary = Column(Text)  # Rolling summary of the conversation, refreshed in the background
+    summary_until = Column(DateTime)  # created_at of the newest message the summary covers
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -195,7 +244,14 @@ class Chat(Base):
     character = relationship("Character", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
-    def to_dict(self):
+    def to_dict(self, last_message: Optional["Message"] = None):
+        """
+        Chat with its character and newest message.
+
+        List views pass ``last_message`` instead of loading ``messages``.
+        """
+        if last_message is None and "messages" not in inspect(self).unloaded:
+            last_message = max(self.messages, key=lambda x: (x.created_at, x.id), default=None)
         return {
             "id": self.id,
             "user_id": self.user_id,
@@ -205,14 +261,15 @@ class Chat(Base):
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
             "character": self.character.to_dict() if self.character else None,
-            "last_message": (
-                sorted(self.messages, key=lambda x: x.created_at, reverse=True)[0].to_dict()
-                if self.messages else None
-            )
+            "last_message": last_message.to_dict() if last_message else None
         }
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves a chat's history in order; id breaks ties between equal timestamps
+        Index("ix_messages_chat_id_created_at", "chat_id", "created_at", "id"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=generate_uuid)
     chat_id = Column(String(36), ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
@@ -225,6 +282,7 @@ class Message(Base):
     duration = Column(Float)  # For audio/video messages
     thumbnail_url = Column(String(255))  # For image/video messages
     media_url = Column(String(255))  # For image/audio/video messages
+    token_count = Column(Integer)  # Prompt tokens of the content, set on insert
 
     # Relationships
     chat = relationship("Chat", back_populates="messages")
@@ -241,3 +299,11 @@ class Message(Base):
             "thumbnail_url": self.thumbnail_url or "",
             "media_url": self.media_url or ""
         }
+
+class SeedVersion(Base):
+    __tablename__ = "seed_version"
+
+    # Single row recording which version of the default data has been seeded
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    seeded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
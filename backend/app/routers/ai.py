@@ -4,7 +4,7 @@ from typing import List, Dict, Optional
 import logging
 from ..auth.auth import get_current_user
 from ..models.database import User, Character
-from ..services.ai_service import AIService
+from ..services.ai_service import AIService, get_ai_service
 from sqlalchemy.orm import Session
 from ..database import get_db
 
@@ -27,14 +27,12 @@ CORS_HEADERS = {
     "Content-Type": "application/json",
 }
 
-# AI service instance
-ai_service = AIService()
-
 @router.post("/chat")
 async def chat_completion(
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     try:
         logger.info(f"Processing chat completion request for user {current_user.username}")
@@ -154,7 +152,10 @@ Remember to maintain a consistent, soothing presence throughout the conversation
             response = await ai_service.chat_completion(
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                # Without history the prompt is the character plus the user's text;
+                # identical opening messages are deliberately coalesced into one request
+                shared=len(messages) <= 2
             )
             
             return JSONResponse(
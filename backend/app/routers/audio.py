@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
 import os
-from ..database import get_db
-from ..auth.auth import get_current_user
-from ..models.database import User, Track as TrackModel, Playlist as PlaylistModel, RecentlyPlayed as RecentlyPlayedModel
+import re
+import math
+import aiofiles
+from ..database import get_async_db
+from ..auth.auth import (
+    get_current_user, get_current_user_optional, get_user_from_token,
+    create_media_token, verify_media_token
+)
+from ..services.play_events import play_event_writer
+from ..services.transcoder import resolve_quality
+from ..utils.http_range import RangeFileResponse
+from ..utils.media_converter import (
+    get_hls_dir, HLS_MASTER_PLAYLIST, VARIANT_FORMATS,
+    get_peaks_dir, get_peaks_path, PEAKS_ZOOM_LEVELS
+)
+from ..models.database import User, Track as TrackModel, TrackVariant as TrackVariantModel, Playlist as PlaylistModel, RecentlyPlayed as RecentlyPlayedModel
 from ..schemas.audio import (
     Track, TrackCreate, 
     Playlist, PlaylistCreate, PlaylistUpdate, PlaylistAddTrack, PlaylistRemoveTrack,
@@ -21,27 +35,65 @@ class UpdateDuration(BaseModel):
 
 router = APIRouter()
 
+# Files that may be requested from a track's HLS directory
+HLS_PATH_PATTERN = re.compile(r'^(master\.m3u8|\d+k/(index\.m3u8|segment_\d+\.ts))$')
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+# Playlist.to_dict() serialises every track with its creator
+PLAYLIST_OPTIONS = (
+    joinedload(PlaylistModel.user),
+    selectinload(PlaylistModel.tracks).joinedload(TrackModel.user),
+)
+
+async def get_track_with_user(db: AsyncSession, track_id: str) -> Optional[TrackModel]:
+    result = await db.execute(
+        select(TrackModel).where(
+            TrackModel.id == track_id
+        ).options(
+            joinedload(TrackModel.user)
+        ).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_user_playlist(db: AsyncSession, playlist_id: str, user_id: str) -> Optional[PlaylistModel]:
+    result = await db.execute(
+        select(PlaylistModel).where(
+            PlaylistModel.id == playlist_id,
+            PlaylistModel.user_id == user_id
+        ).options(*PLAYLIST_OPTIONS).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_user_with_favorites(db: AsyncSession, user_id: str) -> User:
+    result = await db.execute(
+        select(User).where(
+            User.id == user_id
+        ).options(
+            selectinload(User.favorite_tracks).joinedload(TrackModel.user)
+        )
+    )
+    return result.scalars().first()
+
 @router.patch("/tracks/{track_id}/duration", response_model=Track)
 async def update_track_duration(
     track_id: str,
     duration_update: UpdateDuration,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update track duration"""
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
         track.duration = duration_update.duration
         track.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(track)
+        await db.commit()
+        track = await get_track_with_user(db, track_id)
         return Track.from_orm(track)
     except HTTPException:
         raise
@@ -52,19 +104,30 @@ async def update_track_duration(
             detail=f"Failed to update track duration: {str(e)}"
         )
 
+def is_initial_range(range_header: Optional[str]) -> bool:
+    """Whether a stream request starts playback rather than seeking within it"""
+    if not range_header:
+        return True
+    return range_header.replace(" ", "").lower().startswith("bytes=0-")
+
 @router.get("/stream/{track_id}")
 async def stream_audio(
     track_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    quality: Optional[str] = None,
+    codec: str = "aac",
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Stream audio file"""
+    """
+    Stream audio file, honouring Range requests so clients can seek.
+
+    A transcoded variant is served instead of the original when the client
+    asks for one with ``?quality=`` (low/medium/high or kbps) or sends
+    ``Save-Data: on``; ``?codec=`` picks aac (default) or opus.
+    """
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
@@ -79,23 +142,45 @@ async def stream_audio(
         
         if not os.path.exists(audio_path):
             raise HTTPException(status_code=404, detail=f"Audio file not found at {audio_path}")
+
+        if codec not in VARIANT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported codec: {codec}")
+
+        media_type = "audio/mpeg"
+        filename = f"{track.title}.mp3"
+        bitrate = resolve_quality(quality, request.headers.get("save-data"))
+        if bitrate is not None:
+            result = await db.execute(
+                select(TrackVariantModel).where(
+                    TrackVariantModel.track_id == track.id,
+                    TrackVariantModel.codec == codec,
+                    TrackVariantModel.bitrate == bitrate
+                )
+            )
+            variant = result.scalars().first()
+            variant_path = os.path.join(base_dir, "static", variant.audio_url) if variant else None
+            # Fall back to the original file until the variant has been transcoded
+            if variant_path and os.path.exists(variant_path):
+                extension, media_type, _ = VARIANT_FORMATS[codec]
+                audio_path = variant_path
+                filename = f"{track.title}.{extension}"
+
+        range_header = request.headers.get("range")
+
+        # Add recently played entry once per playback, not on every seek
+        if is_initial_range(range_header):
+            play_event_writer.record(current_user.id, track.id)
         
-        # Add recently played entry
-        recently_played = RecentlyPlayedModel(
-            user_id=current_user.id,
-            track_id=track_id,
-            played_at=datetime.utcnow()
-        )
-        db.add(recently_played)
-        db.commit()
-        
-        return FileResponse(
+        return RangeFileResponse(
             audio_path,
-            media_type="audio/mpeg",
-            filename=f"{track.title}.mp3",
+            range_header=range_header,
+            if_range=request.headers.get("if-range"),
+            method=request.method,
+            media_type=media_type,
+            filename=filename,
             headers={
-                "Accept-Ranges": "bytes",
                 "Cache-Control": "public, max-age=3600",
+                "Vary": "Save-Data",
             }
         )
     except HTTPException:
@@ -107,18 +192,110 @@ async def stream_audio(
             detail=f"Failed to stream audio: {str(e)}"
         )
 
+def sign_hls_playlist(playlist: str, token: str) -> str:
+    """Append the media token to every URI line of an HLS playlist"""
+    lines = []
+    for line in playlist.splitlines():
+        if line and not line.startswith("#"):
+            line = f"{line}?token={token}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+@router.get("/hls/{track_id}/{path:path}")
+async def stream_hls(
+    track_id: str,
+    path: str,
+    request: Request,
+    token: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    Serve HLS playlists and segments for adaptive bitrate playback.
+
+    The master playlist needs a signed-in user, either from the bearer
+    header or from an access token in ``?token=``. Native HLS players don't
+    send headers with their follow-up requests, so the master playlist
+    rewrites its variant URLs to carry a short-lived media token for this
+    track, and each variant playlist passes the token on to its segments.
+    """
+    try:
+        if not HLS_PATH_PATTERN.match(path):
+            raise HTTPException(status_code=404, detail="HLS file not found")
+
+        if path == HLS_MASTER_PLAYLIST:
+            if current_user is None and token:
+                current_user = await get_user_from_token(db, token)
+            if current_user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user_id = current_user.id
+        else:
+            user_id = verify_media_token(token, track_id) if token else None
+            if user_id is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired HLS token")
+
+        track = await db.get(TrackModel, track_id)
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        hls_path = os.path.join(get_hls_dir(base_dir, track.audio_url), path)
+        if not os.path.exists(hls_path):
+            raise HTTPException(status_code=404, detail="HLS renditions not available for this track")
+
+        extension = os.path.splitext(path)[1]
+        if extension == ".m3u8":
+            if path == HLS_MASTER_PLAYLIST:
+                # The master playlist is fetched once per playback
+                play_event_writer.record(user_id, track.id)
+                token = create_media_token(user_id, track.id)
+            async with aiofiles.open(hls_path, "r") as f:
+                playlist = await f.read()
+            # Signed playlists are per user and must not be shared by caches
+            return Response(
+                content=sign_hls_playlist(playlist, token),
+                media_type=HLS_MEDIA_TYPES[extension],
+                headers={"Cache-Control": "private, no-store"},
+            )
+
+        return RangeFileResponse(
+            hls_path,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            method=request.method,
+            media_type=HLS_MEDIA_TYPES[extension],
+            headers={
+                "Cache-Control": "public, max-age=3600",
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in stream_hls: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to stream HLS: {str(e)}"
+        )
+
 # Track endpoints
 @router.get("/tracks", response_model=List[Track])
 async def get_tracks(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        tracks = db.query(TrackModel).options(
-            joinedload(TrackModel.user)
-        ).offset(skip).limit(limit).all()
+        result = await db.execute(
+            select(TrackModel).options(
+                joinedload(TrackModel.user)
+            ).offset(skip).limit(limit)
+        )
+        tracks = result.scalars().all()
         return [Track.from_orm(track) for track in tracks]
     except Exception as e:
         print(f"Error in get_tracks: {str(e)}")
@@ -129,15 +306,11 @@ async def get_tracks(
 
 @router.get("/favorites", response_model=List[Track])
 async def get_favorites(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        user = db.query(User).filter(
-            User.id == current_user.id
-        ).options(
-            joinedload(User.favorite_tracks).joinedload(TrackModel.user)
-        ).first()
+        user = await get_user_with_favorites(db, current_user.id)
         return [Track.from_orm(track) for track in user.favorite_tracks]
     except Exception as e:
         print(f"Error in get_favorites: {str(e)}")
@@ -149,26 +322,18 @@ async def get_favorites(
 @router.post("/favorites/{track_id}")
 async def add_to_favorites(
     track_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
-        user = db.query(User).filter(
-            User.id == current_user.id
-        ).options(
-            joinedload(User.favorite_tracks)
-        ).first()
+        user = await get_user_with_favorites(db, current_user.id)
         if track not in user.favorite_tracks:
             user.favorite_tracks.append(track)
-            db.commit()
+            await db.commit()
         return {"message": "Track added to favorites"}
     except HTTPException:
         raise
@@ -182,26 +347,18 @@ async def add_to_favorites(
 @router.delete("/favorites/{track_id}")
 async def remove_from_favorites(
     track_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
-        user = db.query(User).filter(
-            User.id == current_user.id
-        ).options(
-            joinedload(User.favorite_tracks)
-        ).first()
+        user = await get_user_with_favorites(db, current_user.id)
         if track in user.favorite_tracks:
             user.favorite_tracks.remove(track)
-            db.commit()
+            await db.commit()
         return {"message": "Track removed from favorites"}
     except HTTPException:
         raise
@@ -212,18 +369,62 @@ async def remove_from_favorites(
             detail=f"Failed to remove track from favorites: {str(e)}"
         )
 
+@router.get("/tracks/{track_id}/peaks")
+async def get_track_peaks(
+    track_id: str,
+    resolution: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get precomputed waveform peaks as audiowaveform ``.dat`` bytes.
+
+    ``resolution`` is the desired number of audio samples per pixel; the
+    closest stored zoom level is returned (the coarsest one by default).
+    """
+    try:
+        if resolution is not None and resolution < 1:
+            raise HTTPException(status_code=400, detail="Resolution must be positive")
+
+        track = await db.get(TrackModel, track_id)
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+
+        if resolution is None:
+            level = max(PEAKS_ZOOM_LEVELS)
+        else:
+            level = min(PEAKS_ZOOM_LEVELS, key=lambda l: abs(math.log(l / resolution)))
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        peaks_path = get_peaks_path(get_peaks_dir(base_dir, track.audio_url), level)
+        if not os.path.exists(peaks_path):
+            raise HTTPException(status_code=404, detail="Waveform peaks not available for this track")
+
+        return RangeFileResponse(
+            peaks_path,
+            media_type="application/octet-stream",
+            headers={
+                "Cache-Control": "public, max-age=3600",
+                "X-Samples-Per-Pixel": str(level),
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_track_peaks: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch waveform peaks: {str(e)}"
+        )
+
 @router.get("/tracks/{track_id}", response_model=Track)
 async def get_track(
     track_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         return Track.from_orm(track)
@@ -239,39 +440,19 @@ async def get_track(
 @router.post("/tracks/play/{track_id}", response_model=RecentlyPlayed)
 async def play_track(
     track_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
-        recently_played = RecentlyPlayedModel(
-            user_id=current_user.id,
-            track_id=track_id,
-            played_at=datetime.utcnow()
-        )
-        db.add(recently_played)
-        db.commit()
-        db.refresh(recently_played)
-        
-        # Reload with track and user relationships
-        recently_played = db.query(RecentlyPlayedModel).filter(
-            RecentlyPlayedModel.id == recently_played.id
-        ).options(
-            joinedload(RecentlyPlayedModel.track).joinedload(TrackModel.user)
-        ).first()
+        # The row is written by the batched play event writer
+        recently_played = play_event_writer.record(current_user.id, track.id)
         return RecentlyPlayed(
-            id=recently_played.id,
-            user_id=recently_played.user_id,
-            track_id=recently_played.track_id,
-            played_at=recently_played.played_at,
-            track=Track.from_orm(recently_played.track)
+            **recently_played,
+            track=Track.from_orm(track)
         )
     except HTTPException:
         raise
@@ -285,16 +466,16 @@ async def play_track(
 # Playlist endpoints
 @router.get("/playlists")
 async def get_playlists(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        playlists = db.query(PlaylistModel).filter(
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).all()
+        result = await db.execute(
+            select(PlaylistModel).where(
+                PlaylistModel.user_id == current_user.id
+            ).options(*PLAYLIST_OPTIONS)
+        )
+        playlists = result.scalars().all()
         
         # Convert to response format using to_dict()
         return [playlist.to_dict() for playlist in playlists]
@@ -308,17 +489,11 @@ async def get_playlists(
 @router.get("/playlists/{playlist_id}")
 async def get_playlist(
     playlist_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        playlist = db.query(PlaylistModel).filter(
-            PlaylistModel.id == playlist_id,
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).first()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         return playlist.to_dict()
@@ -334,14 +509,14 @@ async def get_playlist(
 @router.post("/playlists")
 async def create_playlist(
     playlist: PlaylistCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
         db_playlist = PlaylistModel(**playlist.dict(), user_id=current_user.id)
         db.add(db_playlist)
-        db.commit()
-        db.refresh(db_playlist)
+        await db.commit()
+        db_playlist = await get_user_playlist(db, db_playlist.id, current_user.id)
         return db_playlist.to_dict()
     except Exception as e:
         print(f"Error in create_playlist: {str(e)}")
@@ -354,25 +529,19 @@ async def create_playlist(
 async def update_playlist(
     playlist_id: str,
     playlist_update: PlaylistUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        db_playlist = db.query(PlaylistModel).filter(
-            PlaylistModel.id == playlist_id,
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).first()
+        db_playlist = await get_user_playlist(db, playlist_id, current_user.id)
         if not db_playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
         for key, value in playlist_update.dict(exclude_unset=True).items():
             setattr(db_playlist, key, value)
         
-        db.commit()
-        db.refresh(db_playlist)
+        await db.commit()
+        db_playlist = await get_user_playlist(db, playlist_id, current_user.id)
         return db_playlist.to_dict()
     except HTTPException:
         raise
@@ -387,31 +556,21 @@ async def update_playlist(
 async def add_track_to_playlist(
     playlist_id: str,
     track_data: PlaylistAddTrack,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        playlist = db.query(PlaylistModel).filter(
-            PlaylistModel.id == playlist_id,
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).first()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_data.track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_data.track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
         playlist.tracks.append(track)
-        db.commit()
-        db.refresh(playlist)
+        await db.commit()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         return playlist.to_dict()
     except HTTPException:
         raise
@@ -426,31 +585,21 @@ async def add_track_to_playlist(
 async def remove_track_from_playlist(
     playlist_id: str,
     track_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        playlist = db.query(PlaylistModel).filter(
-            PlaylistModel.id == playlist_id,
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).first()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        track = db.query(TrackModel).filter(
-            TrackModel.id == track_id
-        ).options(
-            joinedload(TrackModel.user)
-        ).first()
+        track = await get_track_with_user(db, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         
         playlist.tracks.remove(track)
-        db.commit()
-        db.refresh(playlist)
+        await db.commit()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         return playlist.to_dict()
     except HTTPException:
         raise
@@ -464,22 +613,16 @@ async def remove_track_from_playlist(
 @router.delete("/playlists/{playlist_id}", response_model=AudioResponse)
 async def delete_playlist(
     playlist_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        playlist = db.query(PlaylistModel).filter(
-            PlaylistModel.id == playlist_id,
-            PlaylistModel.user_id == current_user.id
-        ).options(
-            joinedload(PlaylistModel.user),
-            joinedload(PlaylistModel.tracks)
-        ).first()
+        playlist = await get_user_playlist(db, playlist_id, current_user.id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        db.delete(playlist)
-        db.commit()
+        await db.delete(playlist)
+        await db.commit()
         return AudioResponse(success=True, message="Playlist deleted successfully")
     except HTTPException:
         raise
@@ -494,15 +637,18 @@ async def delete_playlist(
 @router.get("/recently-played", response_model=List[RecentlyPlayed])
 async def get_recently_played(
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        recently_played = db.query(RecentlyPlayedModel).filter(
-            RecentlyPlayedModel.user_id == current_user.id
-        ).options(
-            joinedload(RecentlyPlayedModel.track).joinedload(TrackModel.user)
-        ).order_by(desc(RecentlyPlayedModel.played_at)).limit(limit).all()
+        result = await db.execute(
+            select(RecentlyPlayedModel).where(
+                RecentlyPlayedModel.user_id == current_user.id
+            ).options(
+                joinedload(RecentlyPlayedModel.track).joinedload(TrackModel.user)
+            ).order_by(desc(RecentlyPlayedModel.played_at)).limit(limit)
+        )
+        recently_played = result.scalars().all()
         
         return [
             RecentlyPlayed(
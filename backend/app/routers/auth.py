@@ -3,16 +3,18 @@ from fastapi.security import OAuth2PasswordBearer
 from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta
 import jwt
-from passlib.context import CryptContext
 from typing import Dict, Optional
 import logging
 import json
 import urllib.parse
 import re
 from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..auth.auth import get_user_by_username
 from ..models.database import User
 from ..config import settings
+from ..services.password_hasher import PasswordHasherBusy, password_hasher
 
 # Configure logging
 logging.basicConfig(
@@ -23,7 +25,7 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # Validation patterns
@@ -50,6 +52,13 @@ def create_refresh_token(data: Dict) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def hashing_busy_exception(busy: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="服务器繁忙，请稍后重试",
+        headers={"Retry-After": str(busy.retry_after)},
+    )
+
 def validate_username(username: str) -> bool:
     return bool(USERNAME_PATTERN.match(username))
 
@@ -73,7 +82,7 @@ def create_default_admin(db: Session):
 from ..schemas.auth import LoginRequest, LoginResponse, UserResponse, UserCreate
 
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     try:
         logger.info(f"Received login request for user: {request.username}")
         
@@ -81,12 +90,16 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
             logger.warning("Login attempt with empty username or password")
             raise HTTPException(status_code=400, detail="用户名和密码不能为空")
 
-        user = db.query(User).filter(User.username == request.username).first()
+        user = await get_user_by_username(db, request.username)
         if not user:
             logger.warning(f"Login attempt for non-existent user: {request.username}")
             raise HTTPException(status_code=400, detail="用户名或密码错误")
             
-        if not verify_password(request.password, user.hashed_password):
+        try:
+            password_ok = await password_hasher.verify(request.password, user.hashed_password)
+        except PasswordHasherBusy as busy:
+            raise hashing_busy_exception(busy)
+        if not password_ok:
             logger.warning(f"Failed login attempt for user: {request.username} (invalid password)")
             raise HTTPException(status_code=400, detail="用户名或密码错误")
         
@@ -124,7 +137,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/signup", response_model=LoginResponse)
-async def register(request: UserCreate, db: Session = Depends(get_db)):
+async def register(request: UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         logger.info(f"Received register request for username: {request.username}")
         
@@ -146,18 +159,21 @@ async def register(request: UserCreate, db: Session = Depends(get_db)):
                 detail=f"密码长度不能少于{PASSWORD_MIN_LENGTH}个字符"
             )
         
-        if db.query(User).filter(User.username == request.username).first():
+        if await get_user_by_username(db, request.username):
             logger.warning(f"Username already exists: {request.username}")
             raise HTTPException(status_code=400, detail="用户名已存在")
         
-        hashed_password = get_password_hash(request.password)
+        try:
+            hashed_password = await password_hasher.hash(request.password)
+        except PasswordHasherBusy as busy:
+            raise hashing_busy_exception(busy)
         user = User(
             username=request.username,
             hashed_password=hashed_password,
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
         access_token = create_access_token({"sub": user.username})
         refresh_token = create_refresh_token({"sub": user.username})
@@ -191,7 +207,7 @@ async def register(request: UserCreate, db: Session = Depends(get_db)):
         try:
             # Try to get more details about the database state
             logger.error(f"Current database session state: {db.is_active}")
-            existing_user = db.query(User).filter(User.username == request.username).first()
+            existing_user = await get_user_by_username(db, request.username)
             logger.error(f"Existing user check result: {existing_user is not None}")
         except Exception as inner_e:
             logger.error(f"Error while checking database state: {str(inner_e)}")
@@ -200,7 +216,7 @@ async def register(request: UserCreate, db: Session = Depends(get_db)):
 @router.get("/profile")
 async def read_users_me(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -215,7 +231,7 @@ async def read_users_me(
         logger.error(f"JWT decode error: {str(e)}")
         raise HTTPException(status_code=401, detail="无效的认证凭据")
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_by_username(db, username)
     if user is None:
         logger.warning(f"User not found: {username}")
         raise HTTPException(status_code=401, detail="用户不存在")
@@ -257,7 +273,7 @@ async def logout(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/verify")
-async def verify_token(request: Request, db: Session = Depends(get_db)):
+async def verify_token(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
@@ -271,7 +287,7 @@ async def verify_token(request: Request, db: Session = Depends(get_db)):
             logger.warning("Invalid token: no username found")
             raise HTTPException(status_code=401, detail="Invalid authentication token")
         
-        user = db.query(User).filter(User.username == username).first()
+        user = await get_user_by_username(db, username)
         if user is None:
             logger.warning(f"User not found: {username}")
             raise HTTPException(status_code=401, detail="User not found")
@@ -291,7 +307,7 @@ async def verify_token(request: Request, db: Session = Depends(get_db)):
 @router.post("/refresh")
 async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -304,7 +320,7 @@ async def refresh_token(
             logger.warning("No username in refresh token")
             raise HTTPException(status_code=401, detail="无效的刷新令牌")
         
-        user = db.query(User).filter(User.username == username).first()
+        user = await get_user_by_username(db, username)
         if not user:
             logger.warning(f"User not found during refresh: {username}")
             raise HTTPException(status_code=401, detail="用户不存在")
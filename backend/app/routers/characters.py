@@ -1,12 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from fastapi.responses import JSONResponse
 from typing import List, Optional
+import os
 import logging
+from starlette.concurrency import run_in_threadpool
 from ..auth.auth import get_current_user, get_current_user_optional
-from ..models.database import Character, User
+from ..models.database import Character, Chat, User
 from ..schemas.character import CharacterCreate, CharacterUpdate, CharacterResponse
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from ..database import get_async_db
+from ..utils.media_converter import create_default_image
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +22,14 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def get_character_with_user(db: AsyncSession, character_id: str, user_id: Optional[str] = None) -> Optional[Character]:
+    """Load a character with its creator, optionally only if owned by the given user"""
+    query = select(Character).where(Character.id == character_id).options(joinedload(Character.user))
+    if user_id is not None:
+        query = query.where(Character.user_id == user_id)
+    result = await db.execute(query.execution_options(populate_existing=True))
+    return result.scalars().first()
+
 # CORS headers
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -34,7 +47,7 @@ async def get_characters(
     page: int = 1,
     limit: int = 10,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info("Getting characters")
@@ -55,13 +68,14 @@ async def get_characters(
             )
 
         # Get all characters
-        query = db.query(Character)
+        query = select(Character)
 
         if search:
-            query = query.filter(Character.name.ilike(f"%{search}%"))
+            query = query.where(Character.name.ilike(f"%{search}%"))
 
         # Get system user
-        system_user = db.query(User).filter(User.username == "system").first()
+        result = await db.execute(select(User).where(User.username == "system"))
+        system_user = result.scalars().first()
         if not system_user:
             logger.error("System user not found")
             return JSONResponse(
@@ -72,10 +86,14 @@ async def get_characters(
 
         # Always return at least the system characters for anonymous users
         if not current_user:
-            query = query.filter(Character.user_id == system_user.id)
+            query = query.where(Character.user_id == system_user.id)
         
-        total = query.count()
-        characters = query.order_by(Character.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        result = await db.execute(
+            query.options(joinedload(Character.user))
+            .order_by(Character.created_at.desc()).offset((page - 1) * limit).limit(limit)
+        )
+        characters = result.scalars().all()
 
         if not characters:
             logger.warning("No characters found in database")
@@ -137,7 +155,7 @@ async def get_characters(
 async def create_character(
     character: CharacterCreate,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info(f"Creating character for user {current_user.username}")
@@ -163,8 +181,21 @@ async def create_character(
             **character.dict()
         )
         db.add(db_character)
-        db.commit()
-        db.refresh(db_character)
+        await db.commit()
+
+        # Give characters created without an image a generated placeholder
+        if not db_character.image_url:
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            image_name = f"character_{db_character.id}.jpg"
+            image_path = os.path.join(base_dir, "static", "images", image_name)
+            try:
+                await run_in_threadpool(create_default_image, image_path, (800, 800), db_character.name)
+                db_character.image_url = f"/static/images/{image_name}"
+                await db.commit()
+            except Exception as e:
+                logger.warning(f"Could not create placeholder image for character {db_character.id}: {str(e)}")
+
+        db_character = await get_character_with_user(db, db_character.id)
 
         # Convert to response format with string IDs
         response_data = db_character.to_dict()
@@ -188,12 +219,12 @@ async def create_character(
 async def get_character(
     character_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info(f"Getting character {character_id}")
 
-        character = db.query(Character).filter(Character.id == character_id).first()
+        character = await get_character_with_user(db, character_id)
         if not character:
             return JSONResponse(
                 status_code=404,
@@ -226,16 +257,13 @@ async def update_character(
     character_id: str,
     character_update: CharacterUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info(f"Updating character {character_id}")
         logger.info(f"Update data: {character_update.dict()}")
 
-        character = db.query(Character).filter(
-            Character.id == character_id,
-            Character.user_id == current_user.id
-        ).first()
+        character = await get_character_with_user(db, character_id, current_user.id)
         if not character:
             return JSONResponse(
                 status_code=404,
@@ -262,8 +290,8 @@ async def update_character(
         for key, value in update_data.items():
             setattr(character, key, value)
 
-        db.commit()
-        db.refresh(character)
+        await db.commit()
+        character = await get_character_with_user(db, character.id)
 
         # Convert to response format with string IDs
         response_data = character.to_dict()
@@ -289,15 +317,19 @@ async def update_character(
 async def delete_character(
     character_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info(f"Deleting character {character_id}")
 
-        character = db.query(Character).filter(
-            Character.id == character_id,
-            Character.user_id == current_user.id
-        ).first()
+        # Chats and their messages are deleted with the character, so load them up front
+        result = await db.execute(
+            select(Character).where(
+                Character.id == character_id,
+                Character.user_id == current_user.id
+            ).options(selectinload(Character.chats).selectinload(Chat.messages))
+        )
+        character = result.scalars().first()
         if not character:
             return JSONResponse(
                 status_code=404,
@@ -305,8 +337,8 @@ async def delete_character(
                 headers=CORS_HEADERS
             )
 
-        db.delete(character)
-        db.commit()
+        await db.delete(character)
+        await db.commit()
 
         return JSONResponse(
             content={"detail": "角色已删除"},
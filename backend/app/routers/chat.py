@@ -1,19 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import JSONResponse, StreamingResponse
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import logging
-from pathlib import Path
-from ..auth.auth import get_current_user
-from ..models.database import Chat, Message, User, Character, generate_uuid
+from ..auth.auth import get_current_user, get_user_from_token
+from ..models.database import Chat, Message, User, Character
 from ..schemas.chat import (
     ChatCreate, ChatUpdate, ChatResponse, MessageCreate, 
     MessageResponse, MessagesResponse, ChatListResponse
 )
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from ..database import AsyncSessionLocal, get_async_db
 from datetime import datetime
-from ..services.ai_service import AIService
+from ..services.ai_service import AIService, get_ai_service
+from ..services.chat_summarizer import chat_summarizer
+from ..config import settings
+from ..utils.tokens import count_tokens
 import io
+import json
+import base64
 
 # Configure logging
 logging.basicConfig(
@@ -36,13 +43,116 @@ CORS_HEADERS = {
 # Message type validation
 VALID_MESSAGE_TYPES = {"text", "audio"}
 
+# The character with its creator, read by Chat.to_dict(); list views add
+# the newest message with get_last_messages()
+CHAT_LIST_OPTIONS = (
+    joinedload(Chat.character).joinedload(Character.user),
+)
+
+# Everything Chat.to_dict() reads for a single chat, messages included
+CHAT_DETAIL_OPTIONS = CHAT_LIST_OPTIONS + (
+    selectinload(Chat.messages),
+)
+
+def last_messages_query(chat_ids: List[str]):
+    newest_id = (
+        select(Message.id).where(Message.chat_id == Chat.id)
+        .order_by(Message.created_at.desc(), Message.id.desc()).limit(1)
+        .correlate(Chat).scalar_subquery()
+    )
+    return (
+        select(Message).select_from(Chat).join(Message, Message.id == newest_id)
+        .where(Chat.id.in_(chat_ids))
+    )
+
+async def get_last_messages(db: AsyncSession, chat_ids: List[str]) -> Dict[str, Message]:
+    """
+    The newest message of each chat, by chat id.
+
+    Each chat's message is found through (chat_id, created_at, id) with
+    LIMIT 1, so the cost does not grow with the length of the chats.
+    """
+    if not chat_ids:
+        return {}
+    result = await db.execute(last_messages_query(chat_ids))
+    return {message.chat_id: message for message in result.scalars().all()}
+
+def encode_message_cursor(message: Message) -> str:
+    """Opaque cursor for a message's position in its chat: (created_at, id)"""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_message_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), message_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid message cursor")
+
+def fit_context(entries: List[Tuple[Dict[str, str], int]]) -> List[Dict[str, str]]:
+    """
+    Cut newest-first (message, token count) pairs to the context limits.
+
+    Keeps at most CHAT_CONTEXT_MAX_MESSAGES messages while their token
+    counts fit CHAT_CONTEXT_MAX_TOKENS, and returns them oldest first.
+    """
+    context_messages = []
+    budget = settings.CHAT_CONTEXT_MAX_TOKENS
+    for context_message, tokens in entries[:settings.CHAT_CONTEXT_MAX_MESSAGES]:
+        if tokens > budget:
+            break
+        budget -= tokens
+        context_messages.append(context_message)
+    context_messages.reverse()
+    return context_messages
+
+async def load_context_entries(db: AsyncSession, chat_id: str) -> List[Tuple[Dict[str, str], int]]:
+    """The newest CHAT_CONTEXT_MAX_MESSAGES messages of a chat with their token counts, newest first"""
+    result = await db.execute(
+        select(Message.content, Message.is_from_user, Message.token_count)
+        .where(Message.chat_id == chat_id, Message.content != "")
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(settings.CHAT_CONTEXT_MAX_MESSAGES)
+    )
+    return [
+        (
+            {"role": "user" if is_from_user else "assistant", "content": content},
+            token_count if token_count is not None else count_tokens(content)
+        )
+        for content, is_from_user, token_count in result.all()
+    ]
+
+async def get_context_messages(db: AsyncSession, chat_id: str) -> List[Dict[str, str]]:
+    """
+    The most recent messages of a chat that fit the context limits, oldest first.
+
+    Only the newest CHAT_CONTEXT_MAX_MESSAGES rows are read, so the cost
+    does not grow with the length of the chat.
+    """
+    context_messages = fit_context(await load_context_entries(db, chat_id))
+    logger.info(f"Loaded {len(context_messages)} context messages")
+    return context_messages
+
+def format_sse(event: str, data: Dict) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def get_user_chat(db: AsyncSession, chat_id: str, user_id: str, *options) -> Optional[Chat]:
+    """Load a chat owned by the given user"""
+    result = await db.execute(
+        select(Chat).where(Chat.id == chat_id, Chat.user_id == user_id)
+        .options(*options).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
 @router.get("", response_model=ChatListResponse)
 async def get_chats(
     search: Optional[str] = None,
     page: int = 1,
     limit: int = 10,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         logger.info(f"Getting chats for user {current_user.username}")
@@ -50,16 +160,21 @@ async def get_chats(
         if page < 1 or limit < 1 or limit > 100:
             raise HTTPException(status_code=400, detail="Invalid pagination parameters")
 
-        query = db.query(Chat).filter(Chat.user_id == current_user.id)
+        query = select(Chat).where(Chat.user_id == current_user.id)
         if search:
-            query = query.filter(Chat.title.ilike(f"%{search}%"))
+            query = query.where(Chat.title.ilike(f"%{search}%"))
 
-        total = query.count()
-        chats = query.order_by(Chat.updated_at.desc()).offset((page - 1) * limit).limit(limit).all()
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        result = await db.execute(
+            query.options(*CHAT_LIST_OPTIONS)
+            .order_by(Chat.updated_at.desc()).offset((page - 1) * limit).limit(limit)
+        )
+        chats = result.scalars().all()
+        last_messages = await get_last_messages(db, [chat.id for chat in chats])
 
         chat_list = []
         for chat in chats:
-            response_data = chat.to_dict()
+            response_data = chat.to_dict(last_message=last_messages.get(chat.id))
             if response_data["character"]:
                 response_data["character"]["id"] = str(response_data["character"]["id"])
                 response_data["character"]["user_id"] = str(response_data["character"]["user_id"])
@@ -67,7 +182,6 @@ async def get_chats(
             if response_data["last_message"]:
                 response_data["last_message"]["id"] = str(response_data["last_message"]["id"])
                 response_data["last_message"]["chat_id"] = str(response_data["last_message"]["chat_id"])
-                response_data["last_message"]["is_user"] = response_data["last_message"].pop("is_from_user")
             chat_list.append(response_data)
 
         return {
@@ -86,10 +200,11 @@ async def get_chats(
 async def create_chat(
     chat: ChatCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     try:
-        character = db.query(Character).filter(Character.id == chat.character_id).first()
+        character = await db.get(Character, chat.character_id)
         if not character:
             raise HTTPException(status_code=404, detail="Character not found")
 
@@ -111,11 +226,9 @@ async def create_chat(
             updated_at=datetime.utcnow()
         )
         db.add(db_chat)
-        db.commit()
-        db.refresh(db_chat)
+        await db.commit()
 
         # Create welcome message
-        ai_service = AIService()
         welcome_response = await ai_service.process_message(
             "Hello",
             character.name,
@@ -124,29 +237,21 @@ async def create_chat(
         )
 
         # Create welcome message with audio
-        audio_filename = None
-        if welcome_response["audio"]:
-            # Save audio to file with absolute path
-            audio_filename = f"message_{generate_uuid()}.mp3"
-            audio_base_dir = Path("/app/backend/static/audio")
-            audio_base_dir.mkdir(parents=True, exist_ok=True)
-            audio_path = audio_base_dir / audio_filename
-            audio_path.write_bytes(welcome_response["audio"])
-            logger.info(f"Saved audio file to {audio_path}")
-
         welcome_message = Message(
             chat_id=db_chat.id,
             content=welcome_response["text"],
+            token_count=count_tokens(welcome_response["text"]),
             type="text",
             is_from_user=False,
             created_at=datetime.utcnow(),
-            media_url=f"/static/audio/{audio_filename}" if audio_filename else '',  # Use empty string instead of None
+            media_url=welcome_response["media_url"],
             duration=0.0,
             thumbnail_url=''
         )
         db.add(welcome_message)
-        db.commit()
+        await db.commit()
 
+        db_chat = await get_user_chat(db, db_chat.id, current_user.id, *CHAT_DETAIL_OPTIONS)
         response_data = db_chat.to_dict()
         if response_data["character"]:
             response_data["character"]["id"] = str(response_data["character"]["id"])
@@ -161,98 +266,106 @@ async def create_chat(
         logger.error(f"Error creating chat: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to create chat")
 
+def validate_message(message: MessageCreate):
+    if not message.content or len(message.content) > 5000:
+        raise HTTPException(status_code=400, detail="Invalid message content")
+
+    if message.type not in VALID_MESSAGE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid message type")
+
+async def start_reply(db: AsyncSession, chat_id: str, message: MessageCreate, user_id: str):
+    """
+    Validate a new message, store it and prepare the reply to it.
+
+    The user message is committed before the reply is generated, so it is
+    kept even if generating the reply fails or the client goes away.
+    Returns the chat, its character, the context messages and the user
+    message.
+    """
+    validate_message(message)
+
+    chat = await get_user_chat(db, chat_id, user_id, joinedload(Chat.character))
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    character = chat.character
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+
+    # Get previous messages for context
+    context_messages = await get_context_messages(db, chat_id)
+
+    # Increment character interaction count
+    character.interactions += 1
+
+    # Create user message
+    user_message = Message(
+        chat_id=chat_id,
+        content=message.content,
+        token_count=count_tokens(message.content),
+        type=message.type,
+        is_from_user=True,
+        created_at=datetime.utcnow()
+    )
+    db.add(user_message)
+    await db.commit()
+    return chat, character, context_messages, user_message
+
+async def finish_reply(
+    db: AsyncSession,
+    chat: Chat,
+    text: str,
+    media_url: str,
+    ai_service: AIService
+) -> Message:
+    """Store the character's reply to a message saved by start_reply"""
+    ai_message = Message(
+        chat_id=chat.id,
+        content=text,
+        token_count=count_tokens(text),
+        type="text",
+        is_from_user=False,
+        created_at=datetime.utcnow(),
+        media_url=media_url,
+        duration=0.0,
+        thumbnail_url=''
+    )
+    db.add(ai_message)
+
+    # Update chat timestamp
+    chat.updated_at = datetime.utcnow()
+    await db.commit()
+
+    # Fold the older messages into the chat summary in the background
+    await chat_summarizer.maybe_refresh(db, chat.id, chat.summary_until, ai_service)
+    return ai_message
+
 @router.post("/{chat_id}/messages", response_model=MessagesResponse)
 async def create_message(
     chat_id: str,
     message: MessageCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     try:
-        if not message.content or len(message.content) > 5000:
-            raise HTTPException(status_code=400, detail="Invalid message content")
-
-        if message.type not in VALID_MESSAGE_TYPES:
-            raise HTTPException(status_code=400, detail="Invalid message type")
-
-        chat = db.query(Chat).filter(
-            Chat.id == chat_id,
-            Chat.user_id == current_user.id
-        ).first()
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-
-        character = chat.character
-        if not character:
-            raise HTTPException(status_code=404, detail="Character not found")
-
-        # Get previous messages for context
-        previous_messages = db.query(Message).filter(
-            Message.chat_id == chat_id
-        ).order_by(Message.created_at.asc()).all()
-        
-        # Build context messages with proper ordering
-        context_messages = []
-        for prev_msg in previous_messages:
-            # Skip system messages or messages without content
-            if not prev_msg.content:
-                continue
-                
-            context_messages.append({
-                "role": "user" if prev_msg.is_from_user else "assistant",
-                "content": prev_msg.content
-            })
-            logger.info(f"Added message to context - Role: {'user' if prev_msg.is_from_user else 'assistant'}, Content: {prev_msg.content[:50]}...")
-
-        # Increment character interaction count
-        character.interactions += 1
-        db.commit()
-
-        # Create user message
-        user_message = Message(
-            chat_id=chat_id,
-            content=message.content,
-            type=message.type,
-            is_from_user=True,
-            created_at=datetime.utcnow()
+        chat, character, context_messages, user_message = await start_reply(
+            db, chat_id, message, current_user.id
         )
-        db.add(user_message)
-        
+
         # Get AI response with audio
-        ai_service = AIService()
         response = await ai_service.process_message(
             message.content,
             character.name,
             character.system_prompt,
-            context_messages
+            context_messages,
+            summary=chat.summary
         )
 
         # Create AI response message with audio
-        audio_filename = None
-        if response["audio"]:
-            # Save audio to file with absolute path
-            audio_filename = f"message_{generate_uuid()}.mp3"
-            audio_base_dir = Path("/app/backend/static/audio")
-            audio_base_dir.mkdir(parents=True, exist_ok=True)
-            audio_path = audio_base_dir / audio_filename
-            audio_path.write_bytes(response["audio"])
-            logger.info(f"Saved audio file to {audio_path}")
-
-        ai_message = Message(
-            chat_id=chat_id,
-            content=response["text"],
-            type="text",
-            is_from_user=False,
-            created_at=datetime.utcnow(),
-            media_url=f"/static/audio/{audio_filename}" if audio_filename else '',  # Use empty string instead of None
-            duration=0.0,
-            thumbnail_url=''
+        ai_message = await finish_reply(
+            db, chat, response["text"], response["media_url"], ai_service
         )
-        db.add(ai_message)
-
-        # Update chat timestamp
-        chat.updated_at = datetime.utcnow()
-        db.commit()
 
         # Return both messages
         return {
@@ -274,37 +387,275 @@ async def create_message(
         logger.error(f"Error creating message: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process message")
 
+@router.post("/{chat_id}/messages/stream")
+async def stream_message(
+    chat_id: str,
+    message: MessageCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Reply to a message as server-sent events.
+
+    Emits ``delta`` events with the text as it is generated, ``audio_ready``
+    with the media URL once the speech is saved, then ``message`` with both
+    persisted messages. The user message is saved before streaming starts.
+    Failures after the stream started are sent as an ``error`` event, and
+    a reply cut short by an error or a disconnected client is discarded.
+    Validation errors are returned before streaming, as for
+    ``POST /{chat_id}/messages``.
+    """
+    try:
+        chat, character, context_messages, user_message = await start_reply(
+            db, chat_id, message, current_user.id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating message: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to process message")
+
+    async def events():
+        reply = ai_service.stream_message(
+            message.content,
+            character.name,
+            character.system_prompt,
+            context_messages,
+            summary=chat.summary
+        )
+        try:
+            async for event in reply:
+                if event["type"] == "delta":
+                    yield format_sse("delta", {"content": event["content"]})
+                elif event["type"] == "done":
+                    if event["media_url"]:
+                        yield format_sse("audio_ready", {"media_url": event["media_url"]})
+                    ai_message = await finish_reply(db, chat, event["text"], event["media_url"], ai_service)
+                    yield format_sse("message", {
+                        "id": ai_message.id,
+                        "messages": [
+                            {**user_message.to_dict(), "is_user": True},
+                            {**ai_message.to_dict(), "is_user": False}
+                        ]
+                    })
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected; its message is saved, the partial reply is not
+            logger.info(f"Client left chat {chat.id} mid-reply, discarding the partial reply")
+            # Stop generating and synthesizing the rest of the reply now
+            await reply.aclose()
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": "Failed to process message"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            **CORS_HEADERS,
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+class ChatSession:
+    """
+    State of one WebSocket conversation, loaded once when it opens.
+
+    Keeps the character prompt, the chat summary and the newest context
+    messages in memory, so a turn only writes the new messages instead of
+    re-loading the chat, its character and its history.
+    """
+
+    def __init__(self, chat: Chat, context_entries: List[Tuple[Dict[str, str], int]]):
+        self.chat_id = chat.id
+        self.character_id = chat.character.id
+        self.character_name = chat.character.name
+        self.system_prompt = chat.character.system_prompt
+        self.summary = chat.summary
+        self.summary_until = chat.summary_until
+        # Newest first, like load_context_entries()
+        self.context_entries = context_entries
+
+    @property
+    def context_messages(self) -> List[Dict[str, str]]:
+        return fit_context(self.context_entries)
+
+    def remember(self, role: str, content: str, tokens: int):
+        self.context_entries.insert(0, ({"role": role, "content": content}, tokens))
+        del self.context_entries[settings.CHAT_CONTEXT_MAX_MESSAGES:]
+
+    async def save_turn(
+        self,
+        message: MessageCreate,
+        text: str,
+        media_url: str,
+        ai_service: AIService
+    ) -> Tuple[Message, Message]:
+        """Store a user message and its reply, and pick up a refreshed summary"""
+        now = datetime.utcnow()
+        user_message = Message(
+            chat_id=self.chat_id,
+            content=message.content,
+            token_count=count_tokens(message.content),
+            type=message.type,
+            is_from_user=True,
+            created_at=now
+        )
+        ai_message = Message(
+            chat_id=self.chat_id,
+            content=text,
+            token_count=count_tokens(text),
+            type="text",
+            is_from_user=False,
+            created_at=datetime.utcnow(),
+            media_url=media_url,
+            duration=0.0,
+            thumbnail_url=''
+        )
+        async with AsyncSessionLocal() as db:
+            db.add_all([user_message, ai_message])
+            await db.execute(
+                update(Character).where(Character.id == self.character_id)
+                .values(interactions=Character.interactions + 1)
+            )
+            await db.execute(update(Chat).where(Chat.id == self.chat_id).values(updated_at=now))
+            await db.commit()
+
+            # A background refresh may have folded older messages into the summary
+            result = await db.execute(
+                select(Chat.summary, Chat.summary_until).where(Chat.id == self.chat_id)
+            )
+            self.summary, self.summary_until = result.one()
+            await chat_summarizer.maybe_refresh(db, self.chat_id, self.summary_until, ai_service)
+
+        self.remember("user", user_message.content, user_message.token_count)
+        self.remember("assistant", ai_message.content, ai_message.token_count)
+        return user_message, ai_message
+
+async def open_chat_session(websocket: WebSocket, chat_id: str) -> Optional[ChatSession]:
+    """Authenticate the socket and load its chat, or None if either fails"""
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        return None
+
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token(db, token)
+        if user is None or not user.is_active:
+            return None
+        chat = await get_user_chat(db, chat_id, user.id, joinedload(Chat.character))
+        if not chat or not chat.character:
+            return None
+        return ChatSession(chat, await load_context_entries(db, chat_id))
+
+async def send_reply(websocket: WebSocket, session: ChatSession, message: MessageCreate, ai_service: AIService):
+    """Stream the reply to one message over the socket and store both"""
+    async for event in ai_service.stream_message(
+        message.content,
+        session.character_name,
+        session.system_prompt,
+        session.context_messages,
+        summary=session.summary
+    ):
+        if event["type"] == "delta":
+            await websocket.send_json({"event": "delta", "content": event["content"]})
+        elif event["type"] == "audio":
+            await websocket.send_json({
+                "event": "audio",
+                "index": event["index"],
+                "audio": base64.b64encode(event["audio"]).decode()
+            })
+        elif event["type"] == "done":
+            if event["media_url"]:
+                await websocket.send_json({"event": "audio_ready", "media_url": event["media_url"]})
+            user_message, ai_message = await session.save_turn(
+                message, event["text"], event["media_url"], ai_service
+            )
+            await websocket.send_text(json.dumps({
+                "event": "message",
+                "id": ai_message.id,
+                "messages": [
+                    {**user_message.to_dict(), "is_user": True},
+                    {**ai_message.to_dict(), "is_user": False}
+                ]
+            }, default=str))
+
+@router.websocket("/{chat_id}/ws")
+async def chat_websocket(websocket: WebSocket, chat_id: str):
+    """
+    Chat over a WebSocket, authenticated once when it opens.
+
+    The token is passed as ``?token=`` (or an Authorization header). Each
+    client frame is a message like ``{"content": "...", "type": "text"}``;
+    the reply is streamed back as JSON frames: ``delta`` with text,
+    ``audio`` with base64 MP3 for each sentence, ``audio_ready`` with the
+    media URL, then ``message`` with both persisted messages. Invalid
+    frames and failed replies get an ``error`` frame and the socket stays
+    open.
+    """
+    ai_service = websocket.app.state.ai_service
+    session = await open_chat_session(websocket, chat_id)
+    if session is None or ai_service is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                message = MessageCreate(**json.loads(frame))
+                validate_message(message)
+            except (ValueError, TypeError):
+                await websocket.send_json({"event": "error", "detail": "Invalid message"})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"event": "error", "detail": e.detail})
+                continue
+
+            try:
+                await send_reply(websocket, session, message, ai_service)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Error in chat session {chat_id}: {str(e)}", exc_info=True)
+                await websocket.send_json({"event": "error", "detail": "Failed to process message"})
+    except WebSocketDisconnect:
+        logger.info(f"Chat session {chat_id} closed")
+
 @router.get("/{chat_id}/messages/{message_id}/audio")
 async def get_message_audio(
     chat_id: str,
     message_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     try:
         # Verify chat belongs to user
-        chat = db.query(Chat).filter(
-            Chat.id == chat_id,
-            Chat.user_id == current_user.id
-        ).first()
+        chat = await get_user_chat(db, chat_id, current_user.id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
         # Get message
-        message = db.query(Message).filter(
-            Message.id == message_id,
-            Message.chat_id == chat_id,
-            Message.is_from_user == False
-        ).first()
+        result = await db.execute(
+            select(Message).where(
+                Message.id == message_id,
+                Message.chat_id == chat_id,
+                Message.is_from_user == False
+            )
+        )
+        message = result.scalars().first()
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
 
         # Generate audio
-        ai_service = AIService()
-        audio_content = await ai_service.text_to_speech(
-            message.content,
-            cache_key=f"message_{message_id}"
-        )
+        audio_content = await ai_service.text_to_speech(message.content)
 
         return StreamingResponse(
             io.BytesIO(audio_content),
@@ -326,22 +677,44 @@ async def get_messages(
     chat_id: str,
     page: int = 1,
     limit: int = 50,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Verify chat belongs to user
-        chat = db.query(Chat).filter(
-            Chat.id == chat_id,
-            Chat.user_id == current_user.id
-        ).first()
+        chat = await get_user_chat(db, chat_id, current_user.id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        # Get messages with pagination
-        messages = db.query(Message).filter(
-            Message.chat_id == chat_id
-        ).order_by(Message.created_at.asc()).offset((page - 1) * limit).limit(limit).all()
+        # Pages follow (created_at, id) so they line up with the cursors and
+        # are served straight from the (chat_id, created_at, id) index
+        position = tuple_(Message.created_at, Message.id)
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before and after:
+            raise HTTPException(status_code=400, detail="Use either before or after, not both")
+        if before:
+            query = query.where(position < tuple_(*decode_message_cursor(before)))
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+        else:
+            if after:
+                query = query.where(position > tuple_(*decode_message_cursor(after)))
+            else:
+                # Without a cursor keep the original page/offset behaviour
+                query = query.offset((page - 1) * limit)
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+
+        # One extra row tells whether another page follows
+        result = await db.execute(query.limit(limit + 1))
+        messages = result.scalars().all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if before:
+            messages.reverse()
+            has_older, has_newer = has_more, True
+        else:
+            has_older, has_newer = bool(after) or page > 1, has_more
 
         return {
             "messages": [
@@ -350,7 +723,9 @@ async def get_messages(
                     "is_user": message.is_from_user
                 }
                 for message in messages
-            ]
+            ],
+            "before": encode_message_cursor(messages[0]) if messages and has_older else None,
+            "after": encode_message_cursor(messages[-1]) if messages and has_newer else None,
         }
 
     except HTTPException:
@@ -65,3 +65,6 @@ class MessageListResponse(PaginatedResponse):
 
 class MessagesResponse(BaseModel):
     messages: List[MessageResponse]
+    # Cursors for the next older (?before=) and newer (?after=) pages, None when there are none
+    before: Optional[str] = None
+    after: Optional[str] = None
@@ -1,13 +1,26 @@
 import openai
 import logging
-import os
 import asyncio
 import aiohttp
+import httpx
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 import time
 from datetime import datetime, timedelta
-from pathlib import Path
+
+from fastapi import HTTPException, Request
+
+from ..config import settings
+from ..utils.sentences import SentenceSplitter
+from ..utils.single_flight import SingleFlight
+from .audio_store import audio_store
+from .tts_service import tts_cache
+
+try:
+    import h2  # noqa: F401 - lets httpx negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(
@@ -43,49 +56,110 @@ class RateLimiter:
             return True
 
 class AIService:
+    """
+    OpenAI and ElevenLabs client shared by every request of a worker.
+
+    Created once by the application lifespan and kept in ``app.state``, so
+    the rate limiters see all traffic and each upstream gets one keep-alive
+    connection pool instead of a new TCP and TLS handshake per call.
+    """
+
     def __init__(self):
         # OpenAI Configuration
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.openai_model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
-        self.openai_max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "150"))
-        self.openai_temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+        self.openai_api_key = settings.OPENAI_API_KEY
+        self.openai_model = settings.OPENAI_MODEL
+        self.openai_max_tokens = settings.OPENAI_MAX_TOKENS
+        self.openai_temperature = settings.OPENAI_TEMPERATURE
+        self.context_max_messages = settings.CHAT_CONTEXT_MAX_MESSAGES
+        self.openai_api_base = settings.OPENAI_API_BASE
+        self.summary_max_tokens = settings.CHAT_SUMMARY_MAX_TOKENS
 
         # ElevenLabs Configuration (Optional)
-        self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
-        self.elevenlabs_voice_id = os.getenv("ELEVENLABS_VOICE_ID")
-        self.elevenlabs_model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
-        self.elevenlabs_optimize_streaming = os.getenv("ELEVENLABS_OPTIMIZE_STREAMING", "true").lower() == "true"
-        self.elevenlabs_stability = float(os.getenv("ELEVENLABS_STABILITY", "0.75"))
-        self.elevenlabs_similarity_boost = float(os.getenv("ELEVENLABS_SIMILARITY_BOOST", "0.75"))
+        self.elevenlabs_api_key = settings.ELEVENLABS_API_KEY
+        self.elevenlabs_voice_id = settings.ELEVENLABS_VOICE_ID
+        self.elevenlabs_api_base = settings.ELEVENLABS_API_BASE
+        self.elevenlabs_model_id = settings.ELEVENLABS_MODEL_ID
+        self.elevenlabs_optimize_streaming = settings.ELEVENLABS_OPTIMIZE_STREAMING
+        self.elevenlabs_stability = settings.ELEVENLABS_STABILITY
+        self.elevenlabs_similarity_boost = settings.ELEVENLABS_SIMILARITY_BOOST
+
+        # Shared HTTP clients, opened on first use and closed by close()
+        self._openai_session: Optional[aiohttp.ClientSession] = None
+        self._elevenlabs_client: Optional[httpx.AsyncClient] = None
 
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
 
         openai.api_key = self.openai_api_key
+        if self.openai_api_base:
+            openai.api_base = self.openai_api_base
 
         # Initialize rate limiters
-        self.openai_rate_limiter = RateLimiter(max_requests=3, time_window=60)
-        self.elevenlabs_rate_limiter = RateLimiter(max_requests=5, time_window=60)
+        self.openai_rate_limiter = RateLimiter(max_requests=settings.OPENAI_REQUESTS_PER_MINUTE, time_window=60)
+        self.elevenlabs_rate_limiter = RateLimiter(max_requests=settings.ELEVENLABS_REQUESTS_PER_MINUTE, time_window=60)
 
         # Initialize retry settings
         self.max_retries = 3
         self.retry_delay = 1
         self.retry_multiplier = 2
 
-        # Ensure audio cache directory exists if ElevenLabs is configured
+        # Identical concurrent upstream calls are made once and shared
+        self._speech_flights = SingleFlight("text_to_speech")
+        self._completion_flights = SingleFlight("chat_completion")
+        self._reply_flights = SingleFlight("process_message")
+
         if self.elevenlabs_api_key and self.elevenlabs_voice_id:
-            self.cache_dir = Path("cache/audio")
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
             logger.info("ElevenLabs voice synthesis enabled")
         else:
             logger.warning("ElevenLabs voice synthesis disabled - API key or voice ID not set")
 
+    def _get_openai_session(self) -> aiohttp.ClientSession:
+        if self._openai_session is None or self._openai_session.closed:
+            self._openai_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.AI_HTTP_MAX_CONNECTIONS,
+                    keepalive_timeout=settings.AI_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.AI_HTTP_TIMEOUT),
+            )
+        return self._openai_session
+
+    def _get_elevenlabs_client(self) -> httpx.AsyncClient:
+        if self._elevenlabs_client is None:
+            self._elevenlabs_client = httpx.AsyncClient(
+                base_url=self.elevenlabs_api_base,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.AI_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=settings.AI_HTTP_TIMEOUT,
+            )
+        return self._elevenlabs_client
+
+    def flight_stats(self) -> Dict[str, Any]:
+        """How many upstream calls were shared with an identical one in flight"""
+        return {
+            flights.name: flights.stats()
+            for flights in (self._speech_flights, self._completion_flights, self._reply_flights)
+        }
+
+    async def close(self):
+        """Close the shared HTTP connection pools"""
+        if self._openai_session is not None:
+            await self._openai_session.close()
+            self._openai_session = None
+        if self._elevenlabs_client is not None:
+            await self._elevenlabs_client.aclose()
+            self._elevenlabs_client = None
+
     async def _make_request_with_retry(self, func, *args, **kwargs) -> Dict[str, Any]:
         """Helper method to make API requests with retry logic"""
         for attempt in range(self.max_retries):
             try:
                 return await func(*args, **kwargs)
-            except (openai.error.RateLimitError, aiohttp.ClientError) as e:
+            except (openai.error.RateLimitError, aiohttp.ClientError, httpx.TransportError) as e:
                 if attempt == self.max_retries - 1:
                     raise
                 wait_time = self.retry_delay * (self.retry_multiplier ** attempt)
@@ -97,27 +171,48 @@ class AIService:
                     raise
                 await asyncio.sleep(self.retry_delay)
 
+    @staticmethod
+    def _validate_messages(messages: List[Dict[str, str]]):
+        if not messages:
+            raise ValueError("Messages list cannot be empty")
+
+        # Validate messages format
+        for msg in messages:
+            if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
+                raise ValueError("Invalid message format")
+            if msg['role'] not in ['system', 'user', 'assistant']:
+                raise ValueError(f"Invalid role: {msg['role']}")
+
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        shared: bool = False,
     ) -> Dict[str, Any]:
-        """Generate a chat completion using OpenAI's API"""
+        """
+        Generate a chat completion using OpenAI's API.
+
+        With ``shared``, concurrent calls with identical messages and
+        settings share one request and get the same reply. The key is the
+        whole prompt, so user text is deliberately coalesced when it is
+        identical, e.g. the same opening line sent by several users; leave
+        it off where each call needs its own sample.
+        """
+        if shared:
+            key = json.dumps([messages, temperature, max_tokens], sort_keys=True)
+            return await self._completion_flights.do(
+                key, lambda: self.chat_completion(messages, temperature, max_tokens)
+            )
         try:
-            if not messages:
-                raise ValueError("Messages list cannot be empty")
-
-            # Validate messages format
-            for msg in messages:
-                if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-                    raise ValueError("Invalid message format")
-                if msg['role'] not in ['system', 'user', 'assistant']:
-                    raise ValueError(f"Invalid role: {msg['role']}")
+            self._validate_messages(messages)
 
             # Apply rate limiting
             await self.openai_rate_limiter.acquire()
 
+            # The SDK opens a new aiohttp session per call unless one is set for the task
+            openai.aiosession.set(self._get_openai_session())
+
             # Make API request with retry logic
             response = await self._make_request_with_retry(
                 openai.ChatCompletion.acreate,
@@ -144,138 +239,350 @@ class AIService:
             logger.error(f"Chat completion error: {str(e)}")
             raise
 
-    async def text_to_speech(self, text: str, cache_key: Optional[str] = None) -> Optional[bytes]:
-        """Convert text to speech using ElevenLabs API"""
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding the text as it is generated"""
+        self._validate_messages(messages)
+        await self.openai_rate_limiter.acquire()
+        openai.aiosession.set(self._get_openai_session())
+
+        response = await self._make_request_with_retry(
+            openai.ChatCompletion.acreate,
+            model=self.openai_model,
+            messages=messages,
+            temperature=temperature or self.openai_temperature,
+            max_tokens=max_tokens or self.openai_max_tokens,
+            presence_penalty=0.0,
+            frequency_penalty=0.0,
+            timeout=30,
+            stream=True,
+        )
+        async for chunk in response:
+            content = chunk['choices'][0].get('delta', {}).get('content')
+            if content:
+                yield content
+
+    def _speech_request(self, text: str) -> Dict[str, Any]:
+        return {
+            "text": text,
+            "model_id": self.elevenlabs_model_id,
+            "optimize_streaming_latency": self.elevenlabs_optimize_streaming
+        }
+
+    def speech_digest(self, text: str) -> str:
+        """Audio store key of a line: everything sent to ElevenLabs, plus the voice"""
+        return audio_store.digest({"voice_id": self.elevenlabs_voice_id, **self._speech_request(text)})
+
+    async def save_speech(self, text: str, audio: Optional[bytes]) -> str:
+        """Store the speech for a text and return its media URL, or '' without audio"""
+        if not audio:
+            return ''
+        return await audio_store.put(self.speech_digest(text), audio)
+
+    async def text_to_speech(self, text: str) -> Optional[bytes]:
+        """
+        Convert text to speech using ElevenLabs API.
+
+        Lines already in the audio store (the speech of saved messages) are
+        served from it. New speech only goes to the evictable ``tts_cache``;
+        ``save_speech`` persists the audio a message actually points to.
+        """
         try:
             if not self.elevenlabs_api_key or not self.elevenlabs_voice_id:
                 logger.warning("Skipping text-to-speech - ElevenLabs not configured")
                 return None
 
-            # Check cache if cache_key provided
-            if cache_key:
-                cache_file = self.cache_dir / f"{cache_key}.mp3"
-                if cache_file.exists():
-                    return cache_file.read_bytes()
+            digest = self.speech_digest(text)
+            stored = await audio_store.get(digest)
+            if stored:
+                return stored
+            cached = await tts_cache.get_clip(digest)
+            if cached:
+                return cached
 
-            # Apply rate limiting
-            await self.elevenlabs_rate_limiter.acquire()
-
-            # Prepare request
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.elevenlabs_voice_id}"
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.elevenlabs_api_key
-            }
-            data = {
-                "text": text,
-                "model_id": self.elevenlabs_model_id,
-                "optimize_streaming_latency": self.elevenlabs_optimize_streaming
-            }
+            # Concurrent requests for the same line share one synthesis
+            return await self._speech_flights.do(digest, lambda: self._synthesize_speech(text, digest))
 
-            try:
-                logger.info("=== ElevenLabs API Request ===")
-                logger.info(f"URL: {url}")
-                logger.info(f"Headers: {headers}")
-                logger.info(f"Data: {data}")
-                logger.info(f"API Key: {self.elevenlabs_api_key}")  # Log full API key for debugging
-                logger.info(f"Voice ID: {self.elevenlabs_voice_id}")
-                logger.info(f"Model ID: {self.elevenlabs_model_id}")
-                logger.info("============================")
-                
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, headers=headers, json=data) as response:
-                        logger.info(f"Response status: {response.status}")
-                        logger.info(f"Response headers: {dict(response.headers)}")
-                        
-                        if response.status != 200:
-                            error_text = await response.text()
-                            logger.error("=== ElevenLabs API Error ===")
-                            logger.error(f"Status Code: {response.status}")
-                            logger.error(f"Error Text: {error_text}")
-                            logger.error(f"Response Headers: {dict(response.headers)}")
-                            logger.error("==========================")
-                            raise ValueError(f"ElevenLabs API error: {error_text}")
-                        
-                        audio_content = await response.read()
-                        content_type = response.headers.get('Content-Type', '')
-                        logger.info(f"Response Content-Type: {content_type}")
-                        logger.info(f"Successfully received audio content from ElevenLabs: {len(audio_content)} bytes")
-                        
-                        if not content_type.startswith('audio/'):
-                            logger.error(f"Unexpected content type: {content_type}")
-                            return None
-
-                        # Cache the audio if cache_key provided
-                        if cache_key:
-                            cache_file = self.cache_dir / f"{cache_key}.mp3"
-                            cache_file.write_bytes(audio_content)
-                            logger.info(f"Cached audio to {cache_file}")
-
-                        return audio_content
-            except Exception as e:
-                logger.error(f"Error in text_to_speech: {str(e)}")
+        except Exception as e:
+            logger.error(f"Text-to-speech error: {str(e)}")
+            return None
+
+    async def _synthesize_speech(self, text: str, digest: str) -> Optional[bytes]:
+        # Apply rate limiting
+        await self.elevenlabs_rate_limiter.acquire()
+
+        # Prepare request
+        url = f"/v1/text-to-speech/{self.elevenlabs_voice_id}"
+        headers = {
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": self.elevenlabs_api_key
+        }
+        data = self._speech_request(text)
+
+        try:
+            logger.info("=== ElevenLabs API Request ===")
+            logger.info(f"URL: {url}")
+            logger.info(f"Data: {data}")
+            logger.info(f"Voice ID: {self.elevenlabs_voice_id}")
+            logger.info(f"Model ID: {self.elevenlabs_model_id}")
+            logger.info("============================")
+
+            response = await self._get_elevenlabs_client().post(url, headers=headers, json=data)
+            logger.info(f"Response status: {response.status_code} ({response.http_version})")
+            logger.info(f"Response headers: {dict(response.headers)}")
+
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error("=== ElevenLabs API Error ===")
+                logger.error(f"Status Code: {response.status_code}")
+                logger.error(f"Error Text: {error_text}")
+                logger.error(f"Response Headers: {dict(response.headers)}")
+                logger.error("==========================")
+                raise ValueError(f"ElevenLabs API error: {error_text}")
+
+            audio_content = response.content
+            content_type = response.headers.get('Content-Type', '')
+            logger.info(f"Response Content-Type: {content_type}")
+            logger.info(f"Successfully received audio content from ElevenLabs: {len(audio_content)} bytes")
+
+            if not content_type.startswith('audio/'):
+                logger.error(f"Unexpected content type: {content_type}")
                 return None
 
+            await tts_cache.put_clip(digest, audio_content)
+
+            return audio_content
         except Exception as e:
-            logger.error(f"Text-to-speech error: {str(e)}")
+            logger.error(f"Error in text_to_speech: {str(e)}")
             return None
 
+    def build_chat_messages(
+        self,
+        user_message: str,
+        character_name: str,
+        character_personality: str,
+        previous_messages: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """Prompt for a character's reply: persona, summary, recent messages and the new message"""
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    f"You are {character_name}. {character_personality} "
+                    "Keep responses concise (2-3 sentences) and suitable for ASMR. "
+                    "Maintain a consistent personality and remember previous interactions. "
+                    "Use soft-spoken language and create a peaceful atmosphere."
+                )
+            }
+        ]
+
+        # Earlier conversation that no longer fits in the context window
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the conversation so far: {summary}"
+            })
+
+        # Add previous messages for context
+        if previous_messages:
+            # Only include the most recent messages to stay within token limits
+            context_messages = previous_messages[-self.context_max_messages:]
+            logger.info(f"Adding {len(context_messages)} previous messages for context")
+            messages.extend(context_messages)
+
+        # Add user message
+        messages.append({"role": "user", "content": user_message})
+        logger.info("Final message context:")
+        for msg in messages:
+            logger.info(f"- {msg['role']}: {msg['content'][:50]}...")
+        return messages
+
+    async def stream_message(
+        self,
+        user_message: str,
+        character_name: str,
+        character_personality: str,
+        previous_messages: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a character's reply while its speech is synthesized.
+
+        The completion is streamed and split into sentences, and each
+        sentence is sent to ElevenLabs as soon as it is complete, with at
+        most TTS_MAX_PARALLEL requests in flight. Yields events:
+
+        - ``{"type": "delta", "content": str}`` for each piece of text
+        - ``{"type": "audio", "index": int, "audio": bytes}`` for each
+          sentence's speech, in sentence order
+        - ``{"type": "done", "text": str, "audio": bytes or None,
+          "media_url": str}`` last, with the whole reply, its concatenated
+          speech and where that speech is stored ('' without audio)
+        """
+        messages = self.build_chat_messages(
+            user_message, character_name, character_personality, previous_messages, summary
+        )
+        speech_enabled = bool(self.elevenlabs_api_key and self.elevenlabs_voice_id)
+        events: asyncio.Queue = asyncio.Queue()
+        syntheses: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(settings.TTS_MAX_PARALLEL)
+        pending: List[asyncio.Task] = []
+
+        async def synthesize(sentence: str) -> Optional[bytes]:
+            async with semaphore:
+                return await self.text_to_speech(sentence)
+
+        def start_synthesis(sentence: str):
+            task = asyncio.create_task(synthesize(sentence))
+            pending.append(task)
+            syntheses.put_nowait(task)
+
+        async def collect_audio() -> List[Optional[bytes]]:
+            # Await the sentences in order, so audio is emitted in order
+            parts = []
+            while True:
+                task = await syntheses.get()
+                if task is None:
+                    return parts
+                audio = await task
+                if audio:
+                    await events.put({"type": "audio", "index": len(parts), "audio": audio})
+                parts.append(audio)
+
+        async def run():
+            collector = asyncio.create_task(collect_audio())
+            pending.append(collector)
+            try:
+                splitter = SentenceSplitter()
+                text_parts = []
+                async for content in self.stream_chat_completion(messages):
+                    text_parts.append(content)
+                    await events.put({"type": "delta", "content": content})
+                    if speech_enabled:
+                        for sentence in splitter.feed(content):
+                            start_synthesis(sentence)
+                if speech_enabled:
+                    for sentence in splitter.flush():
+                        start_synthesis(sentence)
+                syntheses.put_nowait(None)
+
+                response_text = "".join(text_parts)
+                audio_parts = await collector
+                audio_content = None
+                if speech_enabled and response_text:
+                    if audio_parts and all(audio_parts):
+                        audio_content = b"".join(audio_parts)
+                    else:
+                        # A sentence failed, synthesize the reply in one piece instead
+                        audio_content = await self.text_to_speech(response_text)
+                media_url = await self.save_speech(response_text, audio_content)
+                await events.put({
+                    "type": "done",
+                    "text": response_text,
+                    "audio": audio_content,
+                    "media_url": media_url
+                })
+            except Exception as e:
+                await events.put({"type": "error", "error": e})
+
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event["type"] == "error":
+                    raise event["error"]
+                yield event
+                if event["type"] == "done":
+                    break
+        finally:
+            # Stop the pipeline if the consumer went away early
+            for task in [runner, *pending]:
+                if not task.done():
+                    task.cancel()
+
     async def process_message(
         self,
         user_message: str,
         character_name: str,
         character_personality: str,
         previous_messages: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Process a user message and return both text and audio responses"""
         try:
-            # Build conversation context
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        f"You are {character_name}. {character_personality} "
-                        "Keep responses concise (2-3 sentences) and suitable for ASMR. "
-                        "Maintain a consistent personality and remember previous interactions. "
-                        "Use soft-spoken language and create a peaceful atmosphere."
-                    )
-                }
-            ]
-
-            # Add previous messages for context
-            if previous_messages:
-                # Only include the last 5 messages to maintain context without exceeding token limits
-                context_messages = previous_messages[-5:]
-                logger.info(f"Adding {len(context_messages)} previous messages for context")
-                messages.extend(context_messages)
-
-            # Add user message
-            messages.append({"role": "user", "content": user_message})
-            logger.info("Final message context:")
-            for msg in messages:
-                logger.info(f"- {msg['role']}: {msg['content'][:50]}...")
-
-            # Get AI response
-            response = await self.chat_completion(messages)
-            response_text = response["content"]
-
-            # Generate audio response if ElevenLabs is configured
-            audio_content = await self.text_to_speech(
-                response_text,
-                cache_key=f"{character_name}_{hash(response_text)}"
-            ) if self.elevenlabs_api_key and self.elevenlabs_voice_id else None
-
-            return {
-                "text": response_text,
-                "audio": audio_content,
-                "usage": response["usage"]
-            }
+            if previous_messages or summary:
+                return await self._collect_reply(
+                    user_message, character_name, character_personality, previous_messages, summary
+                )
+            # Without history (e.g. the greeting of a new chat) the prompt is just
+            # the character and the message, so identical concurrent messages to
+            # the same character deliberately share one reply
+            return await self._reply_flights.do(
+                (user_message, character_name, character_personality),
+                lambda: self._collect_reply(user_message, character_name, character_personality)
+            )
 
         except Exception as e:
             logger.error(f"Message processing error: {str(e)}")
             raise
 
+    async def _collect_reply(
+        self,
+        user_message: str,
+        character_name: str,
+        character_personality: str,
+        previous_messages: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        result = None
+        async for event in self.stream_message(
+            user_message, character_name, character_personality, previous_messages, summary
+        ):
+            if event["type"] == "done":
+                result = event
+
+        return {
+            "text": result["text"],
+            "audio": result["audio"],
+            "media_url": result["media_url"],
+            "usage": None
+        }
+
+    async def summarize_conversation(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+        character_name: str,
+    ) -> str:
+        """Fold new messages into a conversation's running summary"""
+        transcript = "\n".join(
+            f"{'User' if msg['role'] == 'user' else character_name}: {msg['content']}"
+            for msg in messages
+        )
+        prompt = [
+            {
+                "role": "system",
+                "content": (
+                    f"You keep a running summary of a conversation between a user and {character_name}. "
+                    "Update the summary with the new messages. Keep names, preferences, facts and open "
+                    "topics the user mentioned, drop small talk, and write at most a short paragraph "
+                    "in the language of the conversation."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+            }
+        ]
+        response = await self.chat_completion(prompt, temperature=0.3, max_tokens=self.summary_max_tokens)
+        return response["content"].strip()
+
     async def moderate_content(self, text: str) -> bool:
         """Check if content is appropriate using OpenAI's moderation API"""
         try:
@@ -287,3 +594,10 @@ class AIService:
         except Exception as e:
             logger.error(f"Moderation error: {str(e)}")
             return True  # Default to allowing content if moderation fails
+
+def get_ai_service(request: Request) -> AIService:
+    """Dependency returning the AIService created by the application lifespan"""
+    ai_service = getattr(request.app.state, "ai_service", None)
+    if ai_service is None:
+        raise HTTPException(status_code=503, detail="AI service is not configured")
+    return ai_service
@@ -0,0 +1,181 @@
+import os
+import json
+import hashlib
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+from ..config import settings
+from ..utils.media_converter import (
+    DEFAULT_AUDIO, DEFAULT_GIFS, DEFAULT_IMAGES,
+    create_default_audio, create_default_gif, create_default_image, create_default_waveform
+)
+
+logger = logging.getLogger(__name__)
+
+# Manifest of generated assets and the lock serialising bootstrap runs, both in static/
+MANIFEST_NAME = ".asset_manifest.json"
+LOCK_NAME = ".asset_manifest.lock"
+
+# Bump to regenerate every placeholder after changing how they are drawn
+ASSET_VERSION = 1
+
+# Builder name -> function called as builder(dest_path, **params)
+ASSET_BUILDERS = {
+    "image": create_default_image,
+    "waveform": create_default_waveform,
+    "gif": create_default_gif,
+    "audio": create_default_audio,
+}
+
+AssetSpec = Tuple[str, Dict[str, Any]]
+
+def get_bootstrap_workers() -> int:
+    """Number of asset generation processes, one per CPU core unless configured"""
+    return settings.BOOTSTRAP_WORKERS or os.cpu_count() or 1
+
+def get_default_assets() -> Dict[str, AssetSpec]:
+    """Every placeholder asset: path relative to static/ -> (builder, params)"""
+    assets = {}
+    for image_name, size in DEFAULT_IMAGES.items():
+        if image_name == "waveform.png":
+            assets[f"images/{image_name}"] = ("waveform", {})
+        else:
+            text = os.path.splitext(image_name)[0].replace('_', ' ').title()
+            assets[f"images/{image_name}"] = ("image", {"size": list(size), "text": text})
+    for gif_name, size in DEFAULT_GIFS.items():
+        assets[f"gif/{gif_name}"] = ("gif", {"size": list(size)})
+    for audio_name, params in DEFAULT_AUDIO.items():
+        assets[f"audio/{audio_name}"] = ("audio", dict(params))
+    return assets
+
+def params_hash(builder: str, params: Dict[str, Any]) -> str:
+    """Stable digest of everything that determines an asset's content"""
+    payload = json.dumps({"version": ASSET_VERSION, "builder": builder, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def build_asset(builder: str, params: Dict[str, Any], dest_path: str) -> int:
+    """
+    Generate one asset and atomically move it into place.
+
+    The file is written under a temporary name next to its destination, so
+    readers never see a partial file. Returns the final file size.
+    """
+    root, ext = os.path.splitext(dest_path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+    kwargs = dict(params)
+    if "size" in kwargs:
+        kwargs["size"] = tuple(kwargs["size"])
+    try:
+        ASSET_BUILDERS[builder](tmp_path, **kwargs)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dest_path)
+
+def load_manifest(static_dir: str) -> Dict[str, Dict[str, Any]]:
+    manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable asset manifest {manifest_path}: {str(e)}")
+        return {}
+
+def save_manifest(static_dir: str, manifest: Dict[str, Dict[str, Any]]):
+    manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+@contextmanager
+def manifest_lock(static_dir: str):
+    """Hold an exclusive lock so concurrent workers bootstrap one at a time"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(static_dir, LOCK_NAME), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def is_current(entry: Optional[Dict[str, Any]], digest: str, dest_path: str) -> bool:
+    """Check a manifest entry against the wanted parameters and the file on disk"""
+    if not entry or entry.get("params_hash") != digest:
+        return False
+    try:
+        return os.path.getsize(dest_path) == entry.get("size")
+    except OSError:
+        return False
+
+def bootstrap_assets(base_dir: str, workers: Optional[int] = None, force: bool = False) -> int:
+    """
+    Create every missing or outdated placeholder asset under ``static/``.
+
+    Assets are recorded in a manifest with the hash of their parameters and
+    their size, and skipped while both still match. Files that exist but are
+    not in the manifest were provided by hand and are left alone unless
+    ``force`` is set. Work is fanned out to a process pool and the whole run
+    holds a file lock, so a second worker starting at the same time waits and
+    then finds everything up to date. Returns the number of assets built.
+    """
+    static_dir = os.path.join(base_dir, "static")
+    os.makedirs(static_dir, exist_ok=True)
+    os.chmod(static_dir, 0o755)
+    for directory in ("audio", "images", "gif"):
+        path = os.path.join(static_dir, directory)
+        os.makedirs(path, exist_ok=True)
+        os.chmod(path, 0o755)
+
+    with manifest_lock(static_dir):
+        manifest = load_manifest(static_dir)
+        jobs = {}
+        for rel_path, (builder, params) in get_default_assets().items():
+            dest_path = os.path.join(static_dir, rel_path)
+            digest = params_hash(builder, params)
+            entry = manifest.get(rel_path)
+            if not force and is_current(entry, digest, dest_path):
+                continue
+            if not force and entry is None and os.path.exists(dest_path):
+                continue
+            jobs[rel_path] = (builder, params, dest_path, digest)
+
+        if not jobs:
+            logger.info("Placeholder assets are up to date")
+            return 0
+
+        workers = min(workers or get_bootstrap_workers(), len(jobs))
+        logger.info(f"Building {len(jobs)} placeholder assets with {workers} workers")
+        built = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {
+                pool.submit(build_asset, builder, params, dest_path): rel_path
+                for rel_path, (builder, params, dest_path, _) in jobs.items()
+            }
+            for future in as_completed(pending):
+                rel_path = pending[future]
+                builder, _, _, digest = jobs[rel_path]
+                try:
+                    size = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to build placeholder asset {rel_path}: {str(e)}")
+                    continue
+                manifest[rel_path] = {"builder": builder, "params_hash": digest, "size": size}
+                built += 1
+
+        save_manifest(static_dir, manifest)
+        logger.info(f"Built {built} placeholder assets")
+        return built
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiofiles
+import aiofiles.os
+
+logger = logging.getLogger(__name__)
+
+# backend/static, the directory mounted at /static
+STATIC_DIR = Path(__file__).resolve().parents[2] / "static"
+
+class AudioStore:
+    """
+    Content-addressed store for synthesized speech.
+
+    A clip is keyed by the SHA-256 of everything that determines its sound
+    (text, voice, model and synthesis settings), so the same line is
+    synthesized once for every chat, worker and restart. Files are sharded
+    by the first two byte pairs of the digest, e.g. ``ab/cd/abcd....mp3``,
+    to keep directories small. Clips are referenced by ``Message.media_url``
+    and are never evicted.
+    """
+
+    def __init__(self, root: Path, url_prefix: str):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+
+    @staticmethod
+    def digest(params: Dict[str, Any]) -> str:
+        """Stable key for a clip: SHA-256 of the canonical JSON of its parameters"""
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _relative_path(self, digest: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.mp3"
+
+    def path(self, digest: str) -> Path:
+        return self.root / self._relative_path(digest)
+
+    def url(self, digest: str) -> str:
+        return f"{self.url_prefix}/{self._relative_path(digest)}"
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        try:
+            async with aiofiles.open(self.path(digest), "rb") as f:
+                return await f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Audio store read error: {str(e)}")
+            return None
+
+    async def put(self, digest: str, audio: bytes) -> str:
+        """Store a clip unless it is already there, and return its URL"""
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary name first so readers never see a partial file
+            tmp_path = path.with_name(f".{digest}.{uuid.uuid4().hex}.tmp")
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(audio)
+            await aiofiles.os.rename(tmp_path, path)
+            logger.info(f"Stored audio {digest[:12]} ({len(audio)} bytes)")
+        return self.url(digest)
+
+# Shared store under static/, served at /static
+audio_store = AudioStore(root=STATIC_DIR / "audio" / "tts", url_prefix="/static/audio/tts")
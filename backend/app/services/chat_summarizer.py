@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.database import Character, Chat, Message
+from .ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+class ChatSummarizer:
+    """
+    Keeps a rolling summary of each chat, refreshed in the background.
+
+    Once ``interval`` messages have been added since the summary was last
+    refreshed, a task folds them into ``Chat.summary``. At most one refresh
+    runs per chat, and each folds in no more than ``max_messages`` messages
+    so a long chat that was never summarized catches up over a few runs.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.max_messages = interval * 3
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    async def maybe_refresh(
+        self,
+        db: AsyncSession,
+        chat_id: str,
+        summary_until: Optional[datetime],
+        ai_service: AIService
+    ):
+        """Schedule a refresh if enough messages arrived since the last one"""
+        if not self.enabled or chat_id in self._tasks:
+            return
+        # Counting at most `interval` rows keeps this check constant-time
+        pending = select(Message.id).where(Message.chat_id == chat_id)
+        if summary_until is not None:
+            pending = pending.where(Message.created_at > summary_until)
+        result = await db.execute(
+            select(func.count()).select_from(pending.limit(self.interval).subquery())
+        )
+        if result.scalar() < self.interval:
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(chat_id, ai_service))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(chat_id, None))
+
+    async def stop(self):
+        """Wait for the refreshes that are still running"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _refresh(self, chat_id: str, ai_service: AIService):
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Chat.summary, Chat.summary_until, Character.name)
+                    .join(Character, Chat.character_id == Character.id)
+                    .where(Chat.id == chat_id)
+                )
+                row = result.first()
+                if row is None:
+                    return
+                summary, summary_until, character_name = row
+
+                query = select(Message.content, Message.is_from_user, Message.created_at).where(
+                    Message.chat_id == chat_id, Message.content != ""
+                )
+                if summary_until is not None:
+                    query = query.where(Message.created_at > summary_until)
+                result = await db.execute(
+                    query.order_by(Message.created_at.asc(), Message.id.asc()).limit(self.max_messages)
+                )
+                rows = result.all()
+                if not rows:
+                    return
+
+                new_summary = await ai_service.summarize_conversation(
+                    summary,
+                    [
+                        {"role": "user" if is_from_user else "assistant", "content": content}
+                        for content, is_from_user, _ in rows
+                    ],
+                    character_name,
+                )
+                # Keep updated_at as it is so the chat list order does not change
+                await db.execute(
+                    update(Chat).where(Chat.id == chat_id).values(
+                        summary=new_summary,
+                        summary_until=rows[-1].created_at,
+                        updated_at=Chat.updated_at,
+                    )
+                )
+                await db.commit()
+                logger.info(f"Refreshed summary of chat {chat_id} with {len(rows)} messages")
+        except Exception as e:
+            logger.error(f"Failed to refresh summary of chat {chat_id}: {str(e)}", exc_info=True)
+
+# Shared summarizer, drained by the application lifespan
+chat_summarizer = ChatSummarizer(interval=settings.CHAT_SUMMARY_INTERVAL)
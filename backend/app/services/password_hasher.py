@@ -0,0 +1,99 @@
+import math
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from passlib.context import CryptContext
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing thread is busy and the queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing is saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a small dedicated thread pool.
+
+    bcrypt takes a few hundred milliseconds of CPU per call and releases the
+    GIL while it works, so running it off the event loop keeps a login spike
+    from stalling every other request on the worker. At most ``workers``
+    calls run at once and ``queue_size`` more may wait; anything beyond that
+    is refused with ``PasswordHasherBusy`` instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 0)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        # Moving average of the time one call spends hashing, for Retry-After
+        self._avg_seconds = 0.25
+        self.completed = 0
+        self.rejected = 0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil(self._pending * self._avg_seconds / self.workers))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": min(self._pending, self.workers),
+            "queued": max(self._pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self._avg_seconds * 1000, 1),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, func: Callable, *args) -> Any:
+        if self._pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            retry_after = self.retry_after()
+            logger.warning(f"Password hashing saturated ({self._pending} pending), rejecting request")
+            raise PasswordHasherBusy(retry_after)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending += 1
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, func, args
+            )
+        finally:
+            self._pending -= 1
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        self.completed += 1
+        return result
+
+    @staticmethod
+    def _timed(func: Callable, args):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+# Shared hasher, its threads are shut down by the application lifespan
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.database import RecentlyPlayed, generate_uuid
+
+logger = logging.getLogger(__name__)
+
+class PlayEventWriter:
+    """
+    Buffers recently-played rows in memory and writes them in batches.
+
+    Rows are flushed with a single multi-row INSERT once ``batch_size`` rows
+    are queued or ``flush_interval_ms`` has passed since the first queued row,
+    whichever comes first. Until ``start()`` is called (or after ``stop()``),
+    and while the queue is full, each row is written on a worker thread so
+    the event loop never waits on the database.
+    """
+
+    def __init__(self, batch_size: int, flush_interval_ms: int, max_queue_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Single-row writes handed to the thread pool, awaited by stop()
+        self._pending: Set[asyncio.Future] = set()
+
+    def start(self):
+        """Start the background flush loop on the running event loop"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            f"Play event writer started (batch size {self.batch_size}, "
+            f"flush interval {self.flush_interval * 1000:.0f}ms)"
+        )
+
+    async def stop(self):
+        """Flush everything still queued and stop the background loop"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+        logger.info("Play event writer stopped")
+
+    def record(self, user_id: str, track_id: str, played_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Queue a recently-played row and return it as it will be stored"""
+        row = {
+            "id": generate_uuid(),
+            "user_id": user_id,
+            "track_id": track_id,
+            "played_at": played_at or datetime.utcnow(),
+        }
+        if self._task is None:
+            self._write_in_background([row])
+            return row
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            logger.warning("Play event queue is full, writing row on a worker thread")
+            self._write_in_background([row])
+        return row
+
+    def _write_in_background(self, rows: List[Dict[str, Any]]):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Called outside the event loop (scripts, sync code): nothing to block
+            self._write(rows)
+            return
+        future = asyncio.ensure_future(self._flush(rows))
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        try:
+            await run_in_threadpool(self._write, rows)
+            logger.debug(f"Flushed {len(rows)} play events")
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} play events: {str(e)}", exc_info=True)
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(RecentlyPlayed.__table__).values(rows))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+# Shared writer instance, started and stopped by the application lifespan
+play_event_writer = PlayEventWriter(
+    batch_size=settings.PLAY_EVENT_BATCH_SIZE,
+    flush_interval_ms=settings.PLAY_EVENT_FLUSH_INTERVAL_MS,
+    max_queue_size=settings.PLAY_EVENT_QUEUE_SIZE,
+)
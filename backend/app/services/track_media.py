@@ -0,0 +1,64 @@
+import os
+import logging
+
+from sqlalchemy.orm import Session
+
+from ..models.database import Track as TrackModel
+from ..utils.media_converter import (
+    get_hls_dir, hls_is_current, create_hls_renditions,
+    get_peaks_dir, peaks_are_current, extract_waveform_peaks
+)
+from .asset_bootstrap import manifest_lock
+from .transcoder import transcode_tracks
+
+logger = logging.getLogger(__name__)
+
+def build_track_hls(db: Session, base_dir: str):
+    """Create HLS renditions for tracks whose renditions are missing or stale"""
+    for track in db.query(TrackModel).all():
+        audio_path = os.path.join(base_dir, "static", "audio", track.audio_url)
+        if not os.path.exists(audio_path):
+            continue
+        hls_dir = get_hls_dir(base_dir, track.audio_url)
+        if hls_is_current(audio_path, hls_dir):
+            continue
+        try:
+            create_hls_renditions(audio_path, hls_dir)
+        except FileNotFoundError:
+            logger.warning("ffmpeg not available, skipping HLS renditions")
+            return
+        except Exception as e:
+            logger.error(f"Failed to create HLS renditions for track {track.title}: {str(e)}")
+
+def build_track_peaks(db: Session, base_dir: str):
+    """Extract waveform peaks for tracks whose peak files are missing or stale"""
+    for track in db.query(TrackModel).all():
+        audio_path = os.path.join(base_dir, "static", "audio", track.audio_url)
+        if not os.path.exists(audio_path):
+            continue
+        peaks_dir = get_peaks_dir(base_dir, track.audio_url)
+        if peaks_are_current(audio_path, peaks_dir):
+            continue
+        try:
+            extract_waveform_peaks(audio_path, peaks_dir)
+        except FileNotFoundError:
+            logger.warning("ffmpeg not available, skipping waveform peaks")
+            return
+        except Exception as e:
+            logger.error(f"Failed to extract waveform peaks for track {track.title}: {str(e)}")
+
+def build_track_media(db: Session, base_dir: str):
+    """
+    Bring every track's HLS renditions, bitrate ladder and waveform peaks up to date.
+
+    Each kind has its own freshness check against the source file, so this
+    is cheap when nothing changed and is meant to run on every deploy. It
+    holds the bootstrap lock so two nodes starting together don't encode
+    the same files.
+    """
+    static_dir = os.path.join(base_dir, "static")
+    os.makedirs(static_dir, exist_ok=True)
+    with manifest_lock(static_dir):
+        build_track_hls(db, base_dir)
+        transcode_tracks(db, base_dir)
+        build_track_peaks(db, base_dir)
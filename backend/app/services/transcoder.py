@@ -0,0 +1,132 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.database import Track, TrackVariant
+from ..utils.media_converter import TRANSCODE_LADDER, get_variant_url, transcode_audio
+
+logger = logging.getLogger(__name__)
+
+# Named quality levels accepted from clients, mapped to ladder bitrates (kbps)
+QUALITY_BITRATES = {
+    "low": 64,
+    "medium": 128,
+    "high": 192,
+}
+
+def get_transcode_workers() -> int:
+    """Number of transcoding processes, one per CPU core unless configured"""
+    return settings.TRANSCODE_WORKERS or os.cpu_count() or 1
+
+def transcode_tracks(db: Session, base_dir: str, tracks: Optional[List[Track]] = None) -> int:
+    """
+    Produce every missing or stale ladder variant for the given tracks (default: all).
+
+    A variant is stale when the modification time or size of its source
+    file differs from the stamp recorded with it, e.g. after the track's
+    audio was replaced. Jobs for all tracks are submitted to one process
+    pool so it stays saturated, and a variant row is recorded or updated for
+    each finished file. Files that exist and are newer than their source
+    but have no up-to-date row are only registered.
+    Returns the number of variants recorded.
+    """
+    if tracks is None:
+        tracks = db.query(Track).all()
+    static_dir = os.path.join(base_dir, "static")
+
+    existing = {
+        (variant.track_id, variant.codec, variant.bitrate): variant
+        for variant in db.query(TrackVariant).all()
+    }
+    jobs = []
+    for track in tracks:
+        source_path = os.path.join(static_dir, "audio", track.audio_url)
+        if not os.path.exists(source_path):
+            continue
+        source_stat = os.stat(source_path)
+        for codec, bitrates in TRANSCODE_LADDER.items():
+            for bitrate in bitrates:
+                variant = existing.get((track.id, codec, bitrate))
+                if variant is not None and _is_current(variant, source_stat):
+                    continue
+                audio_url = get_variant_url(track.audio_url, codec, bitrate)
+                jobs.append((track, codec, bitrate, audio_url, source_path, os.path.join(static_dir, audio_url), variant, source_stat))
+
+    if not jobs:
+        return 0
+
+    recorded = 0
+    pending = {}
+    with ProcessPoolExecutor(max_workers=get_transcode_workers()) as pool:
+        for job in jobs:
+            track, codec, bitrate, audio_url, source_path, dest_path, variant, source_stat = job
+            # A stamped row that no longer matches means the source was replaced
+            unstamped = variant is None or variant.source_mtime is None
+            if unstamped and os.path.exists(dest_path) and os.path.getmtime(dest_path) >= source_stat.st_mtime:
+                _record_variant(db, variant, track, codec, bitrate, audio_url, os.path.getsize(dest_path), source_stat)
+                recorded += 1
+                continue
+            future = pool.submit(transcode_audio, source_path, dest_path, codec, bitrate)
+            pending[future] = job
+
+        logger.info(f"Transcoding {len(pending)} track variants with {get_transcode_workers()} workers")
+        for future in as_completed(pending):
+            track, codec, bitrate, audio_url, _, _, variant, source_stat = pending[future]
+            try:
+                file_size = future.result()
+            except FileNotFoundError:
+                logger.warning(f"ffmpeg not available, skipping {codec} {bitrate}k for track {track.title}")
+                continue
+            except Exception as e:
+                logger.error(f"Failed to transcode track {track.title} to {codec} {bitrate}k: {str(e)}")
+                continue
+            _record_variant(db, variant, track, codec, bitrate, audio_url, file_size, source_stat)
+            recorded += 1
+
+    db.commit()
+    logger.info(f"Recorded {recorded} track variants")
+    return recorded
+
+def _is_current(variant: TrackVariant, source_stat: os.stat_result) -> bool:
+    return variant.source_mtime == source_stat.st_mtime and variant.source_size == source_stat.st_size
+
+def _record_variant(db: Session, variant: Optional[TrackVariant], track: Track, codec: str, bitrate: int,
+                    audio_url: str, file_size: int, source_stat: os.stat_result):
+    if variant is None:
+        variant = TrackVariant(track_id=track.id, codec=codec, bitrate=bitrate)
+        db.add(variant)
+    variant.audio_url = audio_url
+    variant.file_size = file_size
+    variant.source_mtime = source_stat.st_mtime
+    variant.source_size = source_stat.st_size
+    variant.created_at = datetime.utcnow()
+
+def resolve_quality(quality: Optional[str], save_data: Optional[str]) -> Optional[int]:
+    """
+    Turn client hints into a ladder bitrate.
+
+    An explicit ``?quality=`` (low/medium/high or a kbps value) wins, then a
+    ``Save-Data: on`` header selects the lowest rung. Returns None when the
+    client expressed no preference and the original file should be served.
+    """
+    if quality:
+        quality = quality.strip().lower()
+        if quality == "original":
+            return None
+        if quality in QUALITY_BITRATES:
+            return QUALITY_BITRATES[quality]
+        try:
+            requested = int(quality.rstrip("k"))
+        except ValueError:
+            return None
+        bitrates = sorted(QUALITY_BITRATES.values())
+        # Highest rung that does not exceed the request
+        return max([b for b in bitrates if b <= requested], default=bitrates[0])
+    if save_data and save_data.strip().lower() == "on":
+        return min(QUALITY_BITRATES.values())
+    return None
@@ -4,12 +4,17 @@ import asyncio
 import aiohttp
 import hashlib
 import json
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, FrozenSet, Set, Tuple
 from datetime import datetime, timedelta
 import tempfile
 import aiofiles
 import aiofiles.os
 
+from ..config import settings
+from ..utils.single_flight import SingleFlight
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,37 +23,219 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TTSCache:
-    def __init__(self, cache_dir: str = None):
+    """
+    Two-tier cache of synthesized speech.
+
+    Hot clips are kept in an in-memory LRU bounded by ``memory_bytes``; all
+    clips are written to ``cache_dir``, bounded by ``disk_bytes``. Disk
+    usage and recency are tracked in an index file, loaded once at startup,
+    so lookups, puts and eviction never list or stat the directory. Clips
+    older than ``max_age`` are treated as misses. Going over the disk budget
+    evicts the least recently used clips at once; the background sweeper
+    started by ``start()`` removes expired clips and saves the index. The
+    sweep also reconciles the index with the directory, so clips written
+    after the last save by a worker that was killed are still counted and
+    evicted.
+    """
+
+    INDEX_FILE = "index.json"
+    # Temporary files older than this were left by a worker that died mid-write
+    STALE_TMP_AGE = 3600
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        memory_bytes: int = 32 * 1024 * 1024,
+        disk_bytes: int = 1024 * 1024 * 1024,
+        max_age: timedelta = timedelta(days=7),
+        sweep_interval: float = 600,
+    ):
         self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'tts_cache')
-        self.max_age = timedelta(days=7)  # Cache files for 7 days
+        self.max_age = max_age
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.sweep_interval = sweep_interval
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        # key -> [size, created, last used], least recently used first
+        self._index: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._disk_size = 0
+        # Keys removed since the index was last saved, so a merge does not bring them back
+        self._removed = set()
+        self._task: Optional[asyncio.Task] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
         self.ensure_cache_dir()
+        self._load_index()
 
     def ensure_cache_dir(self):
         """Ensure cache directory exists"""
         os.makedirs(self.cache_dir, exist_ok=True)
 
+    def get_cache_key(self, text: str, voice_id: str, speed: float, pitch: float) -> str:
+        params = f"{text}_{voice_id}_{speed}_{pitch}"
+        return hashlib.md5(params.encode()).hexdigest()
+
     def get_cache_path(self, text: str, voice_id: str, speed: float, pitch: float) -> str:
         """Generate cache file path based on parameters"""
-        params = f"{text}_{voice_id}_{speed}_{pitch}"
-        hash_key = hashlib.md5(params.encode()).hexdigest()
-        return os.path.join(self.cache_dir, f"{hash_key}.mp3")
+        return self._path(self.get_cache_key(text, voice_id, speed, pitch))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _read_index_file(self) -> Optional[Dict[str, List[float]]]:
+        try:
+            with open(self._index_path) as f:
+                return dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable TTS cache index: {str(e)}")
+            return None
+
+    def _scan_directory(self, known: FrozenSet[str]) -> Tuple[Dict[str, List[float]], Set[str]]:
+        """
+        List the clips on disk, returning index entries for those not in
+        ``known`` and the keys of all of them. Stale temporary files are
+        removed on the way.
+        """
+        untracked, present = {}, set()
+        now = time.time()
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                try:
+                    if entry.name.endswith(".tmp"):
+                        if now - entry.stat().st_mtime > self.STALE_TMP_AGE:
+                            os.remove(entry.path)
+                        continue
+                    if not entry.name.endswith(".mp3") or entry.name.startswith("."):
+                        continue
+                    key = entry.name[:-4]
+                    present.add(key)
+                    if key not in known:
+                        stats = entry.stat()
+                        untracked[key] = [stats.st_size, stats.st_mtime, stats.st_atime]
+                except FileNotFoundError:
+                    continue
+        return untracked, present
+
+    def _load_index(self):
+        entries = self._read_index_file()
+        if entries is None:
+            # First start with this directory: index the clips already there once
+            entries, _ = self._scan_directory(frozenset())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1][2]):
+            self._index[key] = list(entry)
+        self._disk_size = sum(entry[0] for entry in self._index.values())
+
+    def _merge_index(self):
+        """Pick up the clips other workers sharing the directory have added"""
+        for key, entry in (self._read_index_file() or {}).items():
+            if key not in self._index and key not in self._removed:
+                self._index[key] = list(entry)
+                self._disk_size += entry[0]
+        self._index = OrderedDict(sorted(self._index.items(), key=lambda item: item[1][2]))
+        self._removed.clear()
+
+    async def _reconcile(self):
+        """
+        Index clips that are on disk but in no saved index (written after the
+        last save by a worker that was killed) and forget clips whose files
+        are gone, so the disk budget stays accurate.
+        """
+        known = frozenset(self._index)
+        untracked, present = await asyncio.get_running_loop().run_in_executor(
+            None, self._scan_directory, known
+        )
+        for key in known:
+            if key not in present and key in self._index:
+                self._disk_size -= self._index.pop(key)[0]
+                if key in self._memory:
+                    self._memory_size -= len(self._memory.pop(key))
+        for key, entry in untracked.items():
+            if key not in self._index:
+                self._index[key] = entry
+                self._disk_size += entry[0]
+        if untracked:
+            logger.info(f"TTS cache: indexed {len(untracked)} clips missing from the index")
+            self._index = OrderedDict(sorted(self._index.items(), key=lambda item: item[1][2]))
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._index.items()), f)
+        os.replace(tmp_path, self._index_path)
+
+    def _remember(self, key: str, audio_data: bytes):
+        """Put a clip in the memory tier, evicting the least recently used ones"""
+        if len(audio_data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = audio_data
+        self._memory_size += len(audio_data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    async def _remove(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._disk_size -= entry[0]
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._removed.add(key)
+        try:
+            await aiofiles.os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._index:
+            await self._remove(next(iter(self._index)))
+
+    def _expired(self, entry: List[float], now: float) -> bool:
+        return now - entry[1] > self.max_age.total_seconds()
 
     async def get(self, text: str, voice_id: str, speed: float, pitch: float) -> Optional[bytes]:
         """Get audio data from cache if available and not expired"""
+        return await self.get_clip(self.get_cache_key(text, voice_id, speed, pitch))
+
+    async def get_clip(self, key: str) -> Optional[bytes]:
+        """Get a clip by its cache key if available and not expired"""
         try:
-            cache_path = self.get_cache_path(text, voice_id, speed, pitch)
-            if not await aiofiles.os.path.exists(cache_path):
+            now = time.time()
+            entry = self._index.get(key)
+            if entry is None or self._expired(entry, now):
+                if entry is not None:
+                    await self._remove(key)
+                self.misses += 1
                 return None
 
-            # Check file age
-            stats = await aiofiles.os.stat(cache_path)
-            file_age = datetime.now() - datetime.fromtimestamp(stats.st_mtime)
-            if file_age > self.max_age:
-                await aiofiles.os.remove(cache_path)
+            entry[2] = now
+            self._index.move_to_end(key)
+            audio_data = self._memory.get(key)
+            if audio_data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio_data
+
+            try:
+                async with aiofiles.open(self._path(key), 'rb') as f:
+                    audio_data = await f.read()
+            except FileNotFoundError:
+                # Evicted by another worker
+                await self._remove(key)
+                self.misses += 1
                 return None
-
-            async with aiofiles.open(cache_path, 'rb') as f:
-                return await f.read()
+            self._remember(key, audio_data)
+            self.disk_hits += 1
+            return audio_data
 
         except Exception as e:
             logger.error(f"Cache read error: {str(e)}")
@@ -56,25 +243,83 @@ class TTSCache:
 
     async def put(self, text: str, voice_id: str, speed: float, pitch: float, audio_data: bytes):
         """Store audio data in cache"""
+        await self.put_clip(self.get_cache_key(text, voice_id, speed, pitch), audio_data)
+
+    async def put_clip(self, key: str, audio_data: bytes):
+        """Store a clip under a cache key chosen by the caller"""
         try:
-            cache_path = self.get_cache_path(text, voice_id, speed, pitch)
-            async with aiofiles.open(cache_path, 'wb') as f:
+            cache_path = self._path(key)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            async with aiofiles.open(tmp_path, 'wb') as f:
                 await f.write(audio_data)
+            await aiofiles.os.rename(tmp_path, cache_path)
+
+            now = time.time()
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._disk_size -= previous[0]
+            self._index[key] = [len(audio_data), now, now]
+            self._disk_size += len(audio_data)
+            self._removed.discard(key)
+            self._remember(key, audio_data)
+            await self._evict_disk()
         except Exception as e:
             logger.error(f"Cache write error: {str(e)}")
 
     async def cleanup(self):
-        """Remove expired cache files"""
+        """Remove expired clips, enforce the disk budget and save the index"""
         try:
-            for filename in os.listdir(self.cache_dir):
-                file_path = os.path.join(self.cache_dir, filename)
-                stats = await aiofiles.os.stat(file_path)
-                file_age = datetime.now() - datetime.fromtimestamp(stats.st_mtime)
-                if file_age > self.max_age:
-                    await aiofiles.os.remove(file_path)
+            now = time.time()
+            self._merge_index()
+            await self._reconcile()
+            for key in [key for key, entry in self._index.items() if self._expired(entry, now)]:
+                await self._remove(key)
+            await self._evict_disk()
+            self._save_index()
         except Exception as e:
             logger.error(f"Cache cleanup error: {str(e)}")
 
+    def start(self):
+        """Start the background sweeper on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sweep())
+
+    async def stop(self):
+        """Stop the sweeper and save the index"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.cleanup()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.cleanup()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._index),
+            "disk_bytes": self._disk_size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+# Shared cache, swept in the background while the application runs
+tts_cache = TTSCache(
+    cache_dir=os.path.join(settings.CACHE_DIR, "tts"),
+    memory_bytes=settings.TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_bytes=settings.TTS_CACHE_DISK_MB * 1024 * 1024,
+    max_age=timedelta(seconds=settings.CACHE_TTL),
+    sweep_interval=settings.TTS_CACHE_SWEEP_INTERVAL,
+)
+
 class TTSService:
     def __init__(self):
         # Get API key from environment variable
@@ -86,7 +331,8 @@ class TTSService:
             self.dummy_mode = False
             
         self.base_url = "https://api.elevenlabs.io/v1"
-        self.cache = TTSCache()
+        self.cache = tts_cache
+        self.flights = SingleFlight("generate_speech")
 
         # Initialize rate limiter (10 requests per minute)
         self.rate_limiter = asyncio.Semaphore(10)
@@ -191,31 +437,12 @@ class TTSService:
                 logger.info("Using dummy TTS service")
                 return b""
 
-            # Prepare request data
-            data = {
-                "text": text,
-                "model_id": "eleven_monolingual_v1",
-                "voice_settings": {
-                    "stability": 0.75,
-                    "similarity_boost": 0.75,
-                    "speed": speed,
-                    "pitch": pitch
-                }
-            }
-
-            # Make request
-            audio_data = await self._make_request(
-                "POST",
-                f"text-to-speech/{voice_id}",
-                json=data,
-                headers={"Content-Type": "application/json"}
+            # Concurrent requests for the same clip share one upstream call
+            return await self.flights.do(
+                self.cache.get_cache_key(text, voice_id, speed, pitch),
+                lambda: self._synthesize(text, voice_id, speed, pitch)
             )
 
-            # Cache the result
-            await self.cache.put(text, voice_id, speed, pitch, audio_data)
-
-            return audio_data
-
         except ValueError as e:
             logger.error(f"Validation error: {str(e)}")
             raise
@@ -223,6 +450,32 @@ class TTSService:
             logger.error(f"Error generating speech: {str(e)}")
             raise ValueError("Failed to generate speech")
 
+    async def _synthesize(self, text: str, voice_id: str, speed: float, pitch: float) -> bytes:
+        # Prepare request data
+        data = {
+            "text": text,
+            "model_id": "eleven_monolingual_v1",
+            "voice_settings": {
+                "stability": 0.75,
+                "similarity_boost": 0.75,
+                "speed": speed,
+                "pitch": pitch
+            }
+        }
+
+        # Make request
+        audio_data = await self._make_request(
+            "POST",
+            f"text-to-speech/{voice_id}",
+            json=data,
+            headers={"Content-Type": "application/json"}
+        )
+
+        # Cache the result
+        await self.cache.put(text, voice_id, speed, pitch, audio_data)
+
+        return audio_data
+
     async def cleanup(self):
         """Cleanup resources"""
         try:
@@ -0,0 +1,266 @@
+import os
+import json
+import struct
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How much of the file head is read to find the first MP3 frame
+HEAD_BYTES = 16 * 1024
+# How much of the file tail is read to find the last Ogg page
+OGG_TAIL_BYTES = 64 * 1024
+
+# MPEG audio lookup tables, indexed by the header fields
+MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+MPEG_LAYERS = {1: 3, 2: 2, 3: 1}
+MPEG_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+MPEG_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_BITRATES[(2, 3)] = MPEG_BITRATES[(2, 2)]
+
+def _parse_mpeg_header(header: bytes) -> Optional[Dict]:
+    """Decode a 4-byte MPEG audio frame header, or return None if it is not one"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = MPEG_VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = MPEG_LAYERS.get((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    mono = (header[3] >> 6) == 3
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if layer == 2 or version == 1 else 576
+        frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "mono": mono,
+        "samples_per_frame": samples_per_frame,
+        "frame_length": frame_length,
+    }
+
+def _mp3_duration(f, file_size: int) -> Optional[float]:
+    head = f.read(HEAD_BYTES)
+    audio_start = 0
+
+    # Skip an ID3v2 tag (syncsafe size, optional footer)
+    if head[:3] == b"ID3" and len(head) >= 10:
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        f.seek(audio_start)
+        head = f.read(HEAD_BYTES)
+
+    # Find the first frame header that is followed by another valid header
+    frame = None
+    offset = 0
+    while offset < len(head) - 4:
+        offset = head.find(b"\xff", offset)
+        if offset < 0 or offset > len(head) - 4:
+            break
+        candidate = _parse_mpeg_header(head[offset:offset + 4])
+        if candidate:
+            next_offset = offset + candidate["frame_length"]
+            if next_offset + 4 > len(head) or _parse_mpeg_header(head[next_offset:next_offset + 4]):
+                frame = candidate
+                break
+        offset += 1
+    if frame is None:
+        return None
+    audio_start += offset
+
+    # Xing/Info header (VBR, or CBR written by LAME) after the side information
+    if frame["version"] == 1:
+        side_info = 17 if frame["mono"] else 32
+    else:
+        side_info = 9 if frame["mono"] else 17
+    xing = offset + 4 + side_info
+    if head[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", head[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", head[xing + 8:xing + 12])[0]
+            return frames * frame["samples_per_frame"] / frame["sample_rate"]
+
+    # VBRI header (Fraunhofer encoder) at a fixed offset
+    vbri = offset + 4 + 32
+    if head[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", head[vbri + 14:vbri + 18])[0]
+        return frames * frame["samples_per_frame"] / frame["sample_rate"]
+
+    # Constant bitrate: derive the duration from the audio payload size
+    audio_end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":
+            audio_end -= 128
+    return max(audio_end - audio_start, 0) * 8 / frame["bitrate"]
+
+def _wav_duration(f, file_size: int) -> Optional[float]:
+    f.seek(12)
+    byte_rate = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            if len(fmt) < 16:
+                return None
+            byte_rate = struct.unpack("<HHIIHH", fmt)[3]
+            f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            data_start = f.tell()
+            # Streamed WAVs may leave the size unset
+            if chunk_size in (0, 0xFFFFFFFF) or data_start + chunk_size > file_size:
+                chunk_size = file_size - data_start
+            return chunk_size / byte_rate
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+def _ogg_duration(f, file_size: int) -> Optional[float]:
+    head = f.read(HEAD_BYTES)
+    if len(head) < 28:
+        return None
+    # The first page carries the codec identification packet
+    segment_count = head[26]
+    packet = head[27 + segment_count:]
+    if packet[:7] == b"\x01vorbis":
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        pre_skip = 0
+    elif packet[:8] == b"OpusHead":
+        # Opus granule positions are always counted at 48 kHz
+        sample_rate = 48000
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+    else:
+        return None
+    if not sample_rate:
+        return None
+
+    # The granule position of the last page is the total sample count
+    tail_start = max(file_size - OGG_TAIL_BYTES, 0)
+    f.seek(tail_start)
+    tail = f.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        return None
+    granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+    if granule < 0:
+        return None
+    return max(granule - pre_skip, 0) / sample_rate
+
+def read_duration(path: str) -> Optional[float]:
+    """
+    Read an audio file's duration from its headers without decoding it.
+
+    Supports MP3 (Xing/Info, VBRI or constant bitrate), WAV and Ogg
+    Vorbis/Opus, sniffed by content rather than extension. Returns None for
+    anything else so the caller can fall back to ffprobe.
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+                return _wav_duration(f, file_size)
+            if magic[:4] == b"OggS":
+                return _ogg_duration(f, file_size)
+            if magic[:3] == b"ID3" or _parse_mpeg_header(magic[:4]):
+                return _mp3_duration(f, file_size)
+    except (OSError, struct.error) as e:
+        logger.warning(f"Could not parse audio headers of {path}: {str(e)}")
+    return None
+
+class DurationCache:
+    """
+    Persistent cache of audio durations keyed by (path, size, mtime).
+
+    Entries are held in memory and written to a JSON file by ``save()``,
+    which merges with whatever other processes have saved in the meantime.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._dirty: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_key(path: str) -> Tuple[str, int, int]:
+        stat_result = os.stat(path)
+        return os.path.abspath(path), stat_result.st_size, stat_result.st_mtime_ns
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable duration cache {self.cache_path}: {str(e)}")
+            return {}
+
+    def get(self, path: str) -> Optional[float]:
+        """Get the cached duration of a file if it has not changed since"""
+        key, size, mtime_ns = self._file_key(path)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            entry = self._entries.get(key)
+        if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+            return entry["duration"]
+        return None
+
+    def put(self, path: str, duration: float):
+        """Remember a file's duration until the next ``save()``"""
+        key, size, mtime_ns = self._file_key(path)
+        entry = {"size": size, "mtime_ns": mtime_ns, "duration": duration}
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            self._entries[key] = entry
+            self._dirty[key] = entry
+
+    def save(self):
+        """Write new entries to disk"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = self._load()
+            entries.update(self._dirty)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+                tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                logger.warning(f"Could not save duration cache {self.cache_path}: {str(e)}")
+                return
+            self._entries = entries
+            self._dirty = {}
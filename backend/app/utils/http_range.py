@@ -0,0 +1,230 @@
+import os
+import stat
+import hashlib
+import secrets
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Requests asking for more ranges than this are served as a plain 200 response,
+# which keeps a single request from fanning out into thousands of tiny reads.
+MAX_RANGES = 16
+
+# ASGI extension that lets the server hand a file slice straight to sendfile(2)
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+ByteRange = Tuple[int, int]
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """Build a strong ETag from the file's mtime and size"""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return '"' + hashlib.md5(etag_base.encode()).hexdigest() + '"'
+
+def parse_range_header(range_header: Optional[str], file_size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a ``Range`` header into sorted, merged, inclusive ``(start, end)`` pairs.
+
+    Returns None when the header is absent, malformed or asks for a unit other
+    than bytes (the full file should be served), and an empty list when none of
+    the requested ranges can be satisfied (416).
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                suffix_length = int(last)
+                if suffix_length < 0:
+                    return None
+                if suffix_length == 0 or file_size == 0:
+                    continue
+                ranges.append((max(file_size - suffix_length, 0), file_size - 1))
+                continue
+
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= file_size:
+            continue
+        ranges.append((start, file_size - 1 if end is None else min(end, file_size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Coalesce overlapping and adjacent ranges
+    merged: List[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def if_range_matches(if_range: Optional[str], etag: str, stat_result: os.stat_result) -> bool:
+    """Check an ``If-Range`` validator against the current representation"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        # Only strong comparison is allowed for If-Range
+        return if_range == etag
+    if if_range.startswith("W/"):
+        return False
+    try:
+        since = parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) == int(since)
+
+class RangeFileResponse(FileResponse):
+    """
+    FileResponse that honours ``Range`` and ``If-Range`` request headers.
+
+    Single ranges are answered with ``206`` and ``Content-Range``, multiple
+    ranges with a ``multipart/byteranges`` body and unsatisfiable ranges with
+    ``416``. When the ASGI server supports the zero-copy send extension, each
+    slice is handed to ``sendfile``; otherwise it is read in chunks.
+    """
+
+    def __init__(
+        self,
+        path,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(path, headers=headers, **kwargs)
+        self.range_header = range_header
+        self.if_range = if_range
+        self.headers["accept-ranges"] = "bytes"
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        self.headers.setdefault("content-length", str(stat_result.st_size))
+        self.headers.setdefault("last-modified", formatdate(stat_result.st_mtime, usegmt=True))
+        self.headers.setdefault("etag", make_etag(stat_result))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+
+        file_size = self.stat_result.st_size
+        ranges = None
+        if self.status_code == 200 and if_range_matches(self.if_range, self.headers["etag"], self.stat_result):
+            ranges = parse_range_header(self.range_header, file_size)
+
+        if ranges is None:
+            await self._send_ranges(scope, send, 200, [(0, file_size - 1)] if file_size else [])
+        elif not ranges:
+            await self._send_not_satisfiable(send, file_size)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+            self.headers["content-length"] = str(end - start + 1)
+            await self._send_ranges(scope, send, 206, ranges)
+        else:
+            await self._send_multipart(scope, send, ranges, file_size)
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_not_satisfiable(self, send: Send, file_size: int) -> None:
+        for header in ("content-disposition", "content-type", "etag", "last-modified"):
+            if header in self.headers:
+                del self.headers[header]
+        self.headers["content-range"] = f"bytes */{file_size}"
+        self.headers["content-length"] = "0"
+        await send({"type": "http.response.start", "status": 416, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_ranges(self, scope: Scope, send: Send, status_code: int, ranges: List[ByteRange]) -> None:
+        await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+        if not self.send_header_only:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                for start, end in ranges:
+                    await self._send_slice(scope, send, file, start, end)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_multipart(self, scope: Scope, send: Send, ranges: List[ByteRange], file_size: int) -> None:
+        boundary = secrets.token_hex(16)
+        part_type = self.media_type or "application/octet-stream"
+        part_headers = [
+            (
+                f"--{boundary}\r\n"
+                f"Content-Type: {part_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode("latin-1")
+        content_length = sum(
+            len(header) + (end - start + 1) + 2
+            for header, (start, end) in zip(part_headers, ranges)
+        ) + len(closing)
+
+        if "content-disposition" in self.headers:
+            del self.headers["content-disposition"]
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(content_length)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+
+        if not self.send_header_only:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                for header, (start, end) in zip(part_headers, ranges):
+                    await send({"type": "http.response.body", "body": header, "more_body": True})
+                    await self._send_slice(scope, send, file, start, end)
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            await send({"type": "http.response.body", "body": closing, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_slice(self, scope: Scope, send: Send, file, start: int, end: int) -> None:
+        """Send bytes ``start..end`` (inclusive) of an open file"""
+        count = end - start + 1
+        if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file.wrapped,
+                "offset": start,
+                "count": count,
+                "more_body": True,
+            })
+            return
+
+        await file.seek(start)
+        while count > 0:
+            chunk = await file.read(min(self.chunk_size, count))
+            if not chunk:
+                logger.warning(f"File {self.path} shrank while serving bytes {start}-{end}")
+                break
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
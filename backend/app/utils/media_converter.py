@@ -1,14 +1,75 @@
 import os
 import shutil
-import math
 import logging
 from PIL import Image, ImageDraw
 import numpy as np
 import wave
 import struct
+import atexit
+from ..config import settings
+from .audio_metadata import DurationCache, read_duration
 
 logger = logging.getLogger(__name__)
 
+# Persistent duration cache shared by everything that calls get_audio_duration
+duration_cache = DurationCache(os.path.join(settings.CACHE_DIR, "audio_durations.json"))
+atexit.register(duration_cache.save)
+
+# HLS renditions produced for every catalogue track
+HLS_BITRATES = (64, 128, 192)  # kbps
+HLS_SEGMENT_SECONDS = 6
+HLS_MASTER_PLAYLIST = "master.m3u8"
+HLS_VARIANT_PLAYLIST = "index.m3u8"
+
+# Placeholder images: gradient colour at the top edge and the extra colour
+# added at full pulse intensity in animated GIFs
+GRADIENT_TOP_COLOR = np.array([40, 40, 60])
+GRADIENT_PULSE_COLOR = np.array([20, 10, 15])
+
+# Placeholder images and GIFs created when their files are missing: name -> size
+DEFAULT_IMAGES = {
+    "kafka_profile.jpg": (800, 800),
+    "kafka_night.jpg": (800, 800),
+    "luna_profile.jpg": (800, 800),
+    "echo_profile.jpg": (800, 800),
+    "waveform.png": (800, 200),
+}
+DEFAULT_GIFS = {
+    "kafka_night.gif": (800, 800),
+}
+
+# Placeholder audio: noise colour -> spectral slope exponent of the amplitude
+NOISE_COLOURS = {
+    "white": 0.0,
+    "pink": 0.5,
+    "brown": 1.0,
+}
+
+# Placeholder catalogue tracks created when their files are missing
+DEFAULT_AUDIO = {
+    "asmr_001.mp3": {"frequency": None, "noise": "pink"},
+    "asmr_002.mp3": {"frequency": None, "noise": "brown"},
+    "asmr_003.mp3": {"frequency": 220.0, "noise": "pink"},
+    "asmr_004.mp3": {"frequency": None, "noise": "brown"},
+}
+
+# Waveform peaks: audio is decoded to mono at this rate, and min/max pairs
+# are stored for each zoom level (samples per pixel, multiples of the finest)
+PEAKS_SAMPLE_RATE = 22050
+PEAKS_ZOOM_LEVELS = (256, 1024, 4096, 16384)
+
+# Transcoding ladder: codec -> bitrates (kbps)
+TRANSCODE_LADDER = {
+    "aac": (64, 128, 192),
+    "opus": (64, 128, 192),
+}
+
+# Codec -> (file extension, media type, ffmpeg encoder arguments)
+VARIANT_FORMATS = {
+    "aac": ("m4a", "audio/mp4", ['-c:a', 'aac', '-movflags', '+faststart']),
+    "opus": ("opus", "audio/ogg", ['-c:a', 'libopus', '-vbr', 'on']),
+}
+
 def create_default_waveform(dest_path):
     """Create a default waveform image"""
     img = Image.new('RGB', (800, 200), color='black')
@@ -20,8 +81,8 @@ def create_default_waveform(dest_path):
     img.save(dest_path)
     print(f"Created default waveform image at: {dest_path}")
 
-def get_audio_duration(audio_path):
-    """Get duration of audio file in seconds"""
+def probe_audio_duration(audio_path):
+    """Get duration of audio file in seconds using ffprobe, or None if it fails"""
     try:
         import subprocess
         result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', audio_path], capture_output=True, text=True)
@@ -34,60 +95,153 @@ def get_audio_duration(audio_path):
                 rate = wav_file.getframerate()
                 return frames / float(rate)
         except:
-            return 60.0  # Default to 1 minute if duration cannot be determined
-
-def create_default_audio(dest_path, duration=60.0):
-    """Create a default audio file"""
-    # Create a simple WAV file with a sine wave
-    sampleRate = 44100
-    frequency = 440.0  # Hz
-    
-    # Create WAV file
-    wav_file = wave.open(dest_path.replace('.mp3', '.wav'), 'w')
-    wav_file.setnchannels(2)  # Stereo
-    wav_file.setsampwidth(2)
-    wav_file.setframerate(sampleRate)
-    
-    # Write sine wave data
-    for i in range(int(duration * sampleRate)):
-        value = int(32767.0 * np.sin(frequency * np.pi * float(i) / float(sampleRate)))
-        # Write the same value to both channels
-        data = struct.pack('<hh', value, value)
-        wav_file.writeframes(data)
-    
-    wav_file.close()
-    
+            return None
+
+def get_audio_duration(audio_path):
+    """
+    Get duration of audio file in seconds.
+
+    Durations are read from the file headers and cached by path, size and
+    mtime; ffprobe is only run for formats the header parser does not know.
+    Call ``duration_cache.save()`` after a batch to persist new entries.
+    """
+    cached = duration_cache.get(audio_path)
+    if cached is not None:
+        return cached
+
+    duration = read_duration(audio_path)
+    if duration is None:
+        duration = probe_audio_duration(audio_path)
+    if duration is None:
+        return 60.0  # Default to 1 minute if duration cannot be determined
+
+    duration_cache.put(audio_path, duration)
+    return duration
+
+def generate_noise(num_samples, colour="white", rng=None):
+    """
+    Generate normalised noise in [-1, 1].
+
+    Pink and brown noise are shaped from white noise in the frequency domain
+    (power falling off as 1/f and 1/f^2 respectively).
+    """
+    if colour not in NOISE_COLOURS:
+        raise ValueError(f"Unknown noise colour: {colour}")
+    rng = rng or np.random.default_rng()
+    noise = rng.standard_normal(num_samples)
+
+    if colour != "white":
+        spectrum = np.fft.rfft(noise)
+        freqs = np.fft.rfftfreq(num_samples)
+        exponent = NOISE_COLOURS[colour]
+        spectrum[0] = 0
+        spectrum[1:] /= freqs[1:] ** exponent
+        noise = np.fft.irfft(spectrum, n=num_samples)
+
+    peak = np.max(np.abs(noise))
+    return noise / peak if peak > 0 else noise
+
+def create_default_audio(dest_path, duration=60.0, frequency=440.0, noise=None,
+                         amplitude=0.8, sample_rate=44100, channels=2, seed=None):
+    """
+    Create a default audio file.
+
+    The signal is a sine tone at ``frequency`` (None for no tone), optionally
+    mixed with ``noise`` of the given colour (white, pink or brown). Noise is
+    generated independently per channel. The whole buffer is synthesised with
+    NumPy and written in one go, then converted to MP3 when ffmpeg is
+    available.
+    """
+    if frequency is None and noise is None:
+        raise ValueError("Either a frequency or a noise colour is required")
+
+    num_samples = int(duration * sample_rate)
+    rng = np.random.default_rng(seed)
+    signal = np.zeros((num_samples, channels))
+
+    if frequency is not None:
+        t = np.arange(num_samples) / sample_rate
+        signal += np.sin(2 * np.pi * frequency * t)[:, np.newaxis]
+    if noise is not None:
+        for channel in range(channels):
+            signal[:, channel] += generate_noise(num_samples, noise, rng)
+
+    peak = np.max(np.abs(signal))
+    if peak > 0:
+        signal *= amplitude / peak
+    frames = (signal * 32767).astype('<i2')
+
+    # Write WAV file
+    wav_path = dest_path.replace('.mp3', '.wav')
+    with wave.open(wav_path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames.tobytes())
+
     # Convert WAV to MP3 using ffmpeg if available
     try:
         import subprocess
-        subprocess.run(['ffmpeg', '-i', dest_path.replace('.mp3', '.wav'), dest_path])
-        os.remove(dest_path.replace('.mp3', '.wav'))
-    except:
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', wav_path, dest_path], check=True)
+        os.remove(wav_path)
+    except Exception:
         # If ffmpeg is not available, just keep the WAV file
-        os.rename(dest_path.replace('.mp3', '.wav'), dest_path)
-    
+        os.replace(wav_path, dest_path)
+
     print(f"Created default audio file at: {dest_path}")
 
-def create_default_gif(dest_path, size=(800, 800)):
-    """Create a default animated GIF"""
+def create_gradient_frames(size, intensities):
+    """
+    Build vertical gradient frames as a ``(frames, height, width, 3)`` array.
+
+    Every frame fades from the top colour to black, brightened by that
+    frame's intensity (0-1) times the pulse colour.
+    """
+    width, height = size
+    fade = 1 - np.arange(height) / height
+    intensities = np.asarray(intensities, dtype=float)
+    # (frames, height, 3) row colours, truncated like int() would
+    rows = (
+        fade[np.newaxis, :, np.newaxis] * GRADIENT_TOP_COLOR
+        + intensities[:, np.newaxis, np.newaxis] * GRADIENT_PULSE_COLOR
+    ).astype(np.uint8)
+    return np.repeat(rows[:, :, np.newaxis, :], width, axis=2)
+
+def create_default_image(dest_path, size=(800, 800), text=None):
+    """Create a default gradient image with optional centred text"""
+    img = Image.fromarray(create_gradient_frames(size, [0.0])[0])
+    if text:
+        draw = ImageDraw.Draw(img)
+        # Draw text without anchor (for better compatibility)
+        text_bbox = draw.textbbox((0, 0), text)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+        x = (size[0] - text_width) // 2
+        y = (size[1] - text_height) // 2
+        draw.text((x, y), text, fill='white')
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    img.save(dest_path)
+    os.chmod(dest_path, 0o644)
+
+def create_default_gif(dest_path, size=(800, 800), frame_count=30, quantize=True):
+    """
+    Create a default animated GIF.
+
+    With ``quantize`` a single palette is computed once from all frames and
+    applied to each of them, instead of Pillow building one per frame.
+    """
     try:
-        frames = []
-        # Create 30 frames with different colors for smoother animation
-        for i in range(30):
-            img = Image.new('RGB', size, color='black')
-            draw = ImageDraw.Draw(img)
-            # Draw a gradient background with pulsing effect
-            phase = i / 30 * 3.14159 * 2  # Full cycle over 30 frames
-            intensity = (math.sin(phase) + 1) / 2  # Normalize to 0-1
-            
-            for y in range(size[1]):
-                color = (
-                    int(40 * (1 - y/size[1]) + 20 * intensity),  # R
-                    int(40 * (1 - y/size[1]) + 10 * intensity),  # G
-                    int(60 * (1 - y/size[1]) + 15 * intensity)   # B
-                )
-                draw.line([(0, y), (size[0], y)], fill=color)
-            frames.append(img)
+        # Gradient background with a pulsing effect, one full cycle over all frames
+        phases = np.arange(frame_count) / frame_count * 2 * np.pi
+        intensities = (np.sin(phases) + 1) / 2  # Normalize to 0-1
+        frame_arrays = create_gradient_frames(size, intensities)
+        frames = [Image.fromarray(frame) for frame in frame_arrays]
+
+        if quantize:
+            # Every colour in the animation appears in the first column of some frame
+            palette_source = Image.fromarray(np.ascontiguousarray(frame_arrays[:, :, :1, :]).reshape(-1, 1, 3))
+            palette = palette_source.quantize(colors=256)
+            frames = [frame.quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames]
         
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
@@ -123,86 +277,212 @@ def create_default_gif(dest_path, size=(800, 800)):
         logger.error(f"Error creating default GIF: {str(e)}")
         raise
 
-def setup_default_audio():
-    """Setup default audio files"""
+def get_hls_dir(base_dir, audio_url):
+    """Get the directory holding the HLS renditions of a track's audio file"""
+    stem = os.path.splitext(os.path.basename(audio_url))[0]
+    return os.path.join(base_dir, "static", "hls", stem)
+
+def hls_is_current(source_path, output_dir):
+    """Check whether the HLS renditions are newer than their source file"""
+    master_path = os.path.join(output_dir, HLS_MASTER_PLAYLIST)
+    if not os.path.exists(master_path):
+        return False
+    return os.path.getmtime(master_path) >= os.path.getmtime(source_path)
+
+def create_hls_renditions(source_path, output_dir, bitrates=HLS_BITRATES, segment_seconds=HLS_SEGMENT_SECONDS):
+    """
+    Cut an audio file into fixed-duration AAC segments at several bitrates.
+
+    Each bitrate gets its own directory (e.g. ``128k/``) with a VOD playlist
+    and its segments, and a master playlist listing the variants is written
+    last so that its presence means the renditions are complete.
+    """
+    import subprocess
+
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+    for bitrate in sorted(bitrates):
+        variant_name = f"{bitrate}k"
+        variant_dir = os.path.join(output_dir, variant_name)
+        os.makedirs(variant_dir, exist_ok=True)
+        subprocess.run(
+            [
+                'ffmpeg', '-y', '-v', 'error',
+                '-i', source_path,
+                '-vn', '-map', '0:a:0',
+                '-c:a', 'aac', '-b:a', f'{bitrate}k', '-ac', '2', '-ar', '44100',
+                '-f', 'hls',
+                '-hls_time', str(segment_seconds),
+                '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', os.path.join(variant_dir, 'segment_%05d.ts'),
+                os.path.join(variant_dir, HLS_VARIANT_PLAYLIST),
+            ],
+            check=True,
+            capture_output=True,
+        )
+        variants.append((bitrate, variant_name))
+
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for bitrate, variant_name in variants:
+        # Advertise the bitrate plus ~10% MPEG-TS container overhead
+        bandwidth = int(bitrate * 1000 * 1.1)
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},CODECS="mp4a.40.2"')
+        lines.append(f"{variant_name}/{HLS_VARIANT_PLAYLIST}")
+
+    master_path = os.path.join(output_dir, HLS_MASTER_PLAYLIST)
+    tmp_path = master_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, master_path)
+    logger.info(f"Created HLS renditions for {source_path} in {output_dir}")
+
+def get_variant_url(audio_url, codec, bitrate):
+    """Get the path of a transcoded variant, relative to the static directory"""
+    stem = os.path.splitext(os.path.basename(audio_url))[0]
+    extension = VARIANT_FORMATS[codec][0]
+    return f"variants/{stem}/{codec}_{bitrate}k.{extension}"
+
+def transcode_audio(source_path, dest_path, codec, bitrate):
+    """
+    Transcode an audio file to the given codec and bitrate.
+
+    Writes to a temporary file first and renames it into place so a partially
+    written variant is never served. Returns the size of the new file.
+    """
+    import subprocess
+
+    extension, _, encoder_args = VARIANT_FORMATS[codec]
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp.{extension}"
     try:
-        # Get the base directory
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        print(f"Base directory: {base_dir}")
-        
-        # Create directories with proper permissions
-        static_dir = os.path.join(base_dir, "static")
-        static_audio_dir = os.path.join(static_dir, "audio")
-        static_images_dir = os.path.join(static_dir, "images")
-        static_gif_dir = os.path.join(static_dir, "gif")
-        
-        # Create directories with proper permissions
-        os.makedirs(static_dir, exist_ok=True)
-        os.chmod(static_dir, 0o755)
-        
-        for directory in [static_audio_dir, static_images_dir, static_gif_dir]:
-            os.makedirs(directory, exist_ok=True)
-            os.chmod(directory, 0o755)
-            print(f"Created directory with permissions: {directory}")
-
-        # Create default images and GIFs
-        images = {
-            "kafka_profile.jpg": (800, 800),
-            "kafka_night.jpg": (800, 800),
-            "luna_profile.jpg": (800, 800),
-            "echo_profile.jpg": (800, 800),
-            "waveform.png": (800, 200)
-        }
-
-        gifs = {
-            "kafka_night.gif": (800, 800)
-        }
-        
-        # Create default images
-        for image_name, size in images.items():
-            image_path = os.path.join(static_images_dir, image_name)
-            if not os.path.exists(image_path):
-                if image_name == "waveform.png":
-                    create_default_waveform(image_path)
-                else:
-                    img = Image.new('RGB', size, color='black')
-                    draw = ImageDraw.Draw(img)
-                    text = image_name.replace('.jpg', '').replace('_', ' ').title()
-                    # Draw a gradient background
-                    for y in range(size[1]):
-                        color = (
-                            int(40 * (1 - y/size[1])),  # R
-                            int(40 * (1 - y/size[1])),  # G
-                            int(60 * (1 - y/size[1]))   # B
-                        )
-                        draw.line([(0, y), (size[0], y)], fill=color)
-                    
-                    # Draw text without anchor (for better compatibility)
-                    text_bbox = draw.textbbox((0, 0), text)
-                    text_width = text_bbox[2] - text_bbox[0]
-                    text_height = text_bbox[3] - text_bbox[1]
-                    x = (size[0] - text_width) // 2
-                    y = (size[1] - text_height) // 2
-                    draw.text((x, y), text, fill='white')
-                    img.save(image_path)
-                    os.chmod(image_path, 0o644)
-                print(f"Created default image at: {image_path}")
-
-        # Create default GIFs
-        for gif_name, size in gifs.items():
-            gif_path = os.path.join(static_gif_dir, gif_name)
-            if not os.path.exists(gif_path):
-                create_default_gif(gif_path, size)
-                print(f"Created default GIF at: {gif_path}")
-
-        # Create default audio files
-        for i in range(1, 5):
-            audio_filename = f"asmr_{i:03d}.mp3"
-            audio_path = os.path.join(static_audio_dir, audio_filename)
-            if not os.path.exists(audio_path):
-                create_default_audio(audio_path)
-                os.chmod(audio_path, 0o644)
-            
-    except Exception as e:
-        print(f"Error in setup_default_audio: {str(e)}")
-        raise
+        subprocess.run(
+            [
+                'ffmpeg', '-y', '-v', 'error',
+                '-i', source_path,
+                '-vn', '-map', '0:a:0',
+                *encoder_args, '-b:a', f'{bitrate}k',
+                tmp_path,
+            ],
+            check=True,
+            capture_output=True,
+        )
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dest_path)
+
+def get_peaks_dir(base_dir, audio_url):
+    """Get the directory holding the waveform peak files of a track's audio file"""
+    stem = os.path.splitext(os.path.basename(audio_url))[0]
+    return os.path.join(base_dir, "static", "peaks", stem)
+
+def get_peaks_path(peaks_dir, samples_per_pixel):
+    """Get the peak file for one zoom level"""
+    return os.path.join(peaks_dir, f"{samples_per_pixel}.dat")
+
+def peaks_are_current(source_path, peaks_dir, levels=PEAKS_ZOOM_LEVELS):
+    """Check whether every zoom level exists and is newer than the source file"""
+    source_mtime = os.path.getmtime(source_path)
+    for level in levels:
+        path = get_peaks_path(peaks_dir, level)
+        if not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+            return False
+    return True
+
+def write_peaks_file(dest_path, mins, maxs, sample_rate, samples_per_pixel, bits=8):
+    """
+    Write min/max peaks in the audiowaveform binary (.dat, version 1) format.
+
+    The 20-byte little-endian header holds version, flags (bit 0 set for
+    8-bit data), sample rate, samples per pixel and the number of pairs,
+    followed by interleaved min/max values.
+    """
+    if bits == 8:
+        # int16 -> int8 by dropping the low byte
+        mins = (mins >> 8).astype('<i1')
+        maxs = (maxs >> 8).astype('<i1')
+        flags = 1
+    else:
+        mins = mins.astype('<i2')
+        maxs = maxs.astype('<i2')
+        flags = 0
+
+    data = np.empty(mins.size * 2, dtype=mins.dtype)
+    data[0::2] = mins
+    data[1::2] = maxs
+    header = struct.pack('<iIiiI', 1, flags, sample_rate, samples_per_pixel, mins.size)
+
+    tmp_path = dest_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(data.tobytes())
+    os.replace(tmp_path, dest_path)
+
+def extract_waveform_peaks(source_path, output_dir, levels=PEAKS_ZOOM_LEVELS, sample_rate=PEAKS_SAMPLE_RATE, bits=8):
+    """
+    Compute waveform peaks for an audio file at several zoom levels.
+
+    The file is decoded to mono 16-bit PCM through an ffmpeg pipe and reduced
+    block by block, so memory use stays bounded for long tracks. Coarser
+    levels are derived from the finest one.
+    """
+    import subprocess
+    import tempfile
+
+    finest = min(levels)
+    if any(level % finest for level in levels):
+        raise ValueError("Zoom levels must be multiples of the finest level")
+
+    block_bytes = finest * 4096 * 2
+    mins, maxs = [], []
+    leftover = np.empty(0, dtype='<i2')
+    # stderr goes to a file so ffmpeg can never block on a full pipe while we read stdout
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            [
+                'ffmpeg', '-v', 'error',
+                '-i', source_path,
+                '-vn', '-ac', '1', '-ar', str(sample_rate),
+                '-f', 's16le', 'pipe:1',
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype='<i2')
+                if leftover.size:
+                    samples = np.concatenate([leftover, samples])
+                whole = samples.size - samples.size % finest
+                frames = samples[:whole].reshape(-1, finest)
+                mins.append(frames.min(axis=1))
+                maxs.append(frames.max(axis=1))
+                leftover = samples[whole:]
+        finally:
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, 'ffmpeg', stderr=stderr_file.read())
+
+    if leftover.size:
+        mins.append(leftover.min(keepdims=True))
+        maxs.append(leftover.max(keepdims=True))
+    finest_mins = np.concatenate(mins) if mins else np.zeros(0, dtype='<i2')
+    finest_maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype='<i2')
+
+    os.makedirs(output_dir, exist_ok=True)
+    for level in sorted(levels):
+        factor = level // finest
+        if factor == 1 or finest_mins.size == 0:
+            level_mins, level_maxs = finest_mins, finest_maxs
+        else:
+            starts = np.arange(0, finest_mins.size, factor)
+            level_mins = np.minimum.reduceat(finest_mins, starts)
+            level_maxs = np.maximum.reduceat(finest_maxs, starts)
+        write_peaks_file(get_peaks_path(output_dir, level), level_mins, level_maxs, sample_rate, level, bits)
+    logger.info(f"Extracted waveform peaks for {source_path} into {output_dir}")
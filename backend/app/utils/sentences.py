@@ -0,0 +1,45 @@
+import re
+from typing import List
+
+# Sentence ends: Latin punctuation followed by whitespace, CJK punctuation
+# on its own (no space follows it), or a line break
+SENTENCE_END = re.compile(r'(?:[.!?…]+["\')\]]*\s+|[。！？；…]+[」』”）]*\s*|\n+)')
+
+# Shorter sentences are merged with the next one, so speech synthesis is
+# not called for fragments like "Hmm." or "Yes!"
+MIN_SENTENCE_CHARS = 20
+
+class SentenceSplitter:
+    """
+    Splits text arriving in chunks into complete sentences.
+
+    ``feed()`` returns the sentences completed by each chunk and keeps the
+    unfinished tail; ``flush()`` returns whatever is left once the stream
+    has ended.
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            # A match at the very end may still grow (e.g. "..." or "?!")
+            if match.end() == len(self._buffer) and not match.group().endswith(("\n", " ")):
+                break
+            if match.end() - start < self.min_chars:
+                continue
+            sentence = self._buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
@@ -0,0 +1,46 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional, counts are estimated without it
+    tiktoken = None
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tokens the chat format adds around every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# CJK characters are roughly one token each; other text about four characters per token
+CJK_PATTERN = re.compile("[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The encoding files are downloaded on first use and may be unavailable offline
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {str(e)}")
+        return None
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """Tokens a message costs in the prompt, including the per-message overhead"""
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+    encoding = _get_encoding(model or settings.OPENAI_MODEL)
+    if encoding is not None:
+        return len(encoding.encode(text)) + MESSAGE_OVERHEAD_TOKENS
+    return estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,100 @@
+"""
+Minimal stand-in for the OpenAI chat completions and ElevenLabs
+text-to-speech APIs.
+
+Lets the chat flow, including background summaries and speech, run without
+network access or API keys:
+
+    uvicorn tests.fake_openai_server:app --port 8001
+    OPENAI_API_BASE=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test \
+    ELEVENLABS_API_BASE=http://127.0.0.1:8001 ELEVENLABS_API_KEY=test ELEVENLABS_VOICE_ID=test \
+    uvicorn app.main:app
+
+Replies are deterministic: summary requests get a summary listing the
+messages they were given, other requests echo the last user message.
+Streamed replies are sent a few characters per chunk, and "speech" is the
+text itself wrapped in ``<mp3>...</mp3>`` after a short delay. Every
+request is kept in ``requests`` for inspection.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI")
+
+requests: List[Dict[str, Any]] = []
+
+def build_reply(messages: List[Dict[str, str]]) -> str:
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    last_user = next((msg["content"] for msg in reversed(messages) if msg["role"] == "user"), "")
+    if "running summary" in system:
+        lines = [line for line in last_user.split("New messages:\n", 1)[-1].splitlines() if line]
+        return f"Summary of {len(lines)} messages: " + " / ".join(lines)
+    summaries = [msg["content"] for msg in messages[1:] if msg["role"] == "system"]
+    context = f" [{len(messages) - 2} context, {len(summaries)} summary]"
+    return f"Echo: {last_user}{context}"
+
+def stream_reply(body: Dict[str, Any], content: str, chunk_size: int = 7):
+    """Server-sent events in the shape of a streamed chat completion"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    def event(delta: Dict[str, str], finish_reason=None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def events():
+        yield event({"role": "assistant"})
+        for start in range(0, len(content), chunk_size):
+            await asyncio.sleep(0.01)
+            yield event({"content": content[start:start + chunk_size]})
+        yield event({}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    requests.append(body)
+    content = build_reply(body.get("messages", []))
+    if body.get("stream"):
+        return stream_reply(body, content)
+    prompt_tokens = sum(len(msg.get("content", "")) // 4 + 4 for msg in body.get("messages", []))
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+@app.post("/v1/text-to-speech/{voice_id}")
+async def text_to_speech(voice_id: str, request: Request):
+    body = await request.json()
+    requests.append(body)
+    await asyncio.sleep(0.05)
+    return Response(content=f"<mp3>{body['text']}</mp3>".encode(), media_type="audio/mpeg")